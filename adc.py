@@ -1,60 +1,286 @@
 # -*- coding: utf-8 -*-
 
+import importlib.util
+import os
+import time
+from collections import deque
+from functools import lru_cache
 from math import nan
-from threading import Thread
-from typing import Iterable, List, TextIO
+from pathlib import Path
+from threading import Condition, Lock, Thread
+from typing import Any, Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, Set, TextIO, Tuple, Type
+
+import numpy as np
+
+import filters
+from sweep import SweepOrigin, angles_at
 
 
 def _is_raspberrypi() -> bool:
     try:
         f_in: TextIO
         with open('/sys/firmware/devicetree/base/model', 'rt') as f_in:
-            if 'raspberry pi' in f_in.read().casefold():
-                return True
-    finally:
+            return 'raspberry pi' in f_in.read().casefold()
+    except OSError:
         return False
 
 
+def _pci_devices() -> Set[Tuple[int, int]]:
+    """ the vendor and device IDs of the PCI devices present, as `lspci -n` would list them """
+    devices: Set[Tuple[int, int]] = set()
+    device_path: Path
+    for device_path in Path('/sys/bus/pci/devices').glob('*'):
+        try:
+            devices.add((int((device_path / 'vendor').read_text(), 16), int((device_path / 'device').read_text(), 16)))
+        except (OSError, ValueError):
+            continue
+    return devices
+
+
+def as_frames(pointer: Any, size: int, channels_count: int) -> np.ndarray:
+    """ wrap a ctypes buffer of interleaved samples into a (frames × channels) array without copying """
+    data: np.ndarray = np.ctypeslib.as_array(pointer, shape=(size,))
+    frames_count: int = size // channels_count
+    return data[:frames_count * channels_count].reshape(frames_count, channels_count)
+
+
+class Reading(NamedTuple):
+    sequence: int
+    timestamp: float  # `time.perf_counter()` when the voltages were taken
+    voltages: Tuple[float, ...]
+
+
+# a consumer gets a contiguous block of frames × channels in volts and the `time.perf_counter()` of its last frame
+BlockConsumer = Callable[[np.ndarray, float], None]
+
+
 class ADC(Thread):
+    # how many recent readings are kept for the consumers that lag behind
+    HISTORY_LENGTH: int = 1024
+    CHANNELS_COUNT: int = 8
+    timeout: float = 0.1
+    # whether the driver passes every frame it takes to `publish_frames`;
+    # the readings of the others go to `block_consumers` as single frames
+    streaming: bool = False
+
     def __init__(self, channels: Iterable[int]):
         super().__init__()
         self.daemon: bool = True
         self.channels: List[int] = list(sorted(channels))
         self.voltages: List[float] = [nan] * len(self.channels)
+        self.sequence: int = 0
+        self._readings: Deque[Reading] = deque(maxlen=self.HISTORY_LENGTH)
+        self._new_reading: Condition = Condition()
+        self.block_consumers: List[BlockConsumer] = []
+        # where the antenna points, in degrees of elevation, if known, and the turn it makes; only the simulator cares
+        self._antenna_angle: float = nan
+        self.antenna_sweep: Optional[SweepOrigin] = None
+        # held by the driver thread while it takes and publishes a reading, and by `reconfigure` while it reprograms
+        self._configuration_lock: Lock = Lock()
+        # the name, the output rate, and the options of the filter that turns the frames into readings
+        self._filter: Optional[Tuple[str, float, Dict[str, Any]]] = None
+        self.decimator: Optional[filters.Decimator] = None
         self._is_running: bool = False
 
+    @property
+    def antenna_angle(self) -> float:
+        if self.antenna_sweep is not None:
+            return float(angles_at(np.array(time.time()), self.antenna_sweep))
+        return self._antenna_angle
+
+    @antenna_angle.setter
+    def antenna_angle(self, angle: float) -> None:
+        """ where the antenna stays; the sweep is over """
+        self._antenna_angle = angle
+        self.antenna_sweep = None
+
     def stop(self):
         self._is_running = False
 
     def run(self):
         self._is_running = True
 
+    def _check_channels(self, channels: List[int]) -> None:
+        if not channels:
+            raise ValueError('No channels specified')
+        if min(channels) < 0:
+            raise ValueError(f'There is no channel {min(channels)}')
+        if max(channels) >= self.CHANNELS_COUNT:
+            raise ValueError(f'There is no channel {max(channels)}')
 
-if _is_raspberrypi():
-    import ads1256
+    def _apply_channels(self) -> None:
+        """ reprogram the running device for `self.channels`; called with the configuration lock held """
+        pass
 
-    ADCDevice = ads1256.ADS1256
-else:
-    try:
-        import ldev_dummy
+    def reconfigure(self, channels: Iterable[int]) -> None:
+        """ switch the running driver to other channels; the readings published since have the new layout """
+        new_channels: List[int] = list(sorted(channels))
+        self._check_channels(new_channels)
+        with self._configuration_lock:
+            self.channels = new_channels
+            self._apply_channels()
+            self.voltages = [nan] * len(self.channels)
+            self._make_decimator()
 
-        ADCDevice = ldev_dummy.LDevDummy
-    except ImportError:
-        from subprocess import Popen, PIPE
+    @property
+    def frame_rate(self) -> float:
+        """ how many frames of all the channels the device takes per second """
+        return nan
 
-        proc: Popen
-        with Popen('ls''pci -n', shell=True, stdout=PIPE) as proc:
-            proc_out: bytes = proc.stdout.read()
+    @property
+    def block_frame_rate(self) -> float:
+        """ how many frames per second `block_consumers` get """
+        return self.frame_rate if self.streaming else 1. / self.reading_period
 
-        if b'10b5:9050' in proc_out and b'1172:0791' not in proc_out:
-            import l780
+    @property
+    def reading_period(self) -> float:
+        """ how long the drivers that take snapshots of their buffers sleep between the readings """
+        return self.timeout if self.decimator is None else 1. / self.decimator.output_rate
 
-            ADCDevice = l780.L780
-        elif b'10b5:9050' not in proc_out and b'1172:0791' in proc_out:
-            import l791
-
-            ADCDevice = l791.L791
-        elif b'10b5:9050' in proc_out and b'1172:0791' in proc_out:
-            raise SystemError('Can not determine ADC device conclusively')
+    def _make_decimator(self) -> None:
+        if self._filter is None or not self.frame_rate > 0.:
+            self.decimator = None
         else:
-            raise SystemError('No ADC device found')
+            name: str
+            output_rate: float
+            options: Dict[str, Any]
+            name, output_rate, options = self._filter
+            self.decimator = filters.make_decimator(name, self.frame_rate, min(output_rate, self.frame_rate),
+                                                    **options)
+
+    def set_filter(self, name: Optional[str], output_rate: float = 10., **options: Any) -> None:
+        """
+        choose the filter from `filters.FILTERS` to make the readings from the frames; `None` for the median;
+        a driver that does not stream its frames has nothing to filter
+        """
+        if name:
+            # fail early on a wrong name
+            filters.make_decimator(name, output_rate, output_rate, **options)
+            if not self.frame_rate > 0.:
+                raise ValueError(f'{self.__class__.__name__} does not stream frames to filter with {name}')
+        with self._configuration_lock:
+            self._filter = (name, float(output_rate), options) if name else None
+            self._make_decimator()
+
+    def reduce_frames(self, frames: np.ndarray) -> np.ndarray:
+        """ one value per channel from a snapshot of a circular buffer, the frames being in no particular order """
+        if self.decimator is None:
+            return np.median(frames, axis=0)
+        return self.decimator.reduce(frames)
+
+    def publish(self, voltages: Iterable[float], timestamp: Optional[float] = None) -> Reading:
+        """ to be called by the driver thread for every new set of voltages """
+        with self._new_reading:
+            self.sequence += 1
+            reading: Reading = Reading(sequence=self.sequence,
+                                       timestamp=time.perf_counter() if timestamp is None else timestamp,
+                                       voltages=tuple(voltages))
+            self.voltages = list(reading.voltages)
+            self._readings.append(reading)
+            self._new_reading.notify_all()
+        if not self.streaming and self.block_consumers:
+            self.publish_block(np.array([reading.voltages], dtype=np.float32), reading.timestamp)
+        return reading
+
+    def publish_block(self, block: np.ndarray, timestamp: Optional[float] = None) -> None:
+        """ to be called by the streaming drivers for every new block of raw frames; keep the consumers fast """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        consumer: BlockConsumer
+        for consumer in self.block_consumers:
+            consumer(block, timestamp)
+
+    def publish_frames(self, block: np.ndarray, timestamp: Optional[float] = None) -> None:
+        """
+        to be called by the streaming drivers for every new block of frames in volts, contiguous with the previous one:
+        the block goes to `block_consumers` as is, and then it is filtered into the readings,
+        or, if there is no filter set, the median of the block becomes a reading
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        self.publish_block(block, timestamp)
+        if self.decimator is None:
+            self.publish(np.median(block, axis=0).tolist(), timestamp)
+            return
+        values: np.ndarray
+        timestamps: np.ndarray
+        values, timestamps = self.decimator.process(block, timestamp)
+        voltages: List[float]
+        for voltages, timestamp in zip(values.tolist(), timestamps.tolist()):
+            self.publish(voltages, timestamp)
+
+    def readings_since(self, sequence: int, timeout: Optional[float] = None) -> List[Reading]:
+        """ block until there are readings newer than `sequence` or the timeout expires; return them in order """
+        with self._new_reading:
+            self._new_reading.wait_for(lambda: self.sequence > sequence, timeout)
+            count: int = min(self.sequence - sequence, len(self._readings))
+            return [self._readings[index] for index in range(len(self._readings) - count, len(self._readings))]
+
+
+# the backend name → the module and the class of its driver, imported only when the backend is used
+BACKENDS: Dict[str, str] = {
+    'ads1256': 'ads1256:ADS1256',
+    'l780': 'l780:L780',
+    'l791': 'l791:L791',
+    'simulator': 'adc_simulator:ADCSimulator',
+    'dummy': 'ldev_dummy:LDevDummy',
+}
+# the PCI vendor and device IDs of the boards → the backend name
+PCI_BACKENDS: Dict[Tuple[int, int], str] = {
+    (0x10b5, 0x9050): 'l780',
+    (0x1172, 0x0791): 'l791',
+}
+
+
+def register_backend(name: str, entry_point: str) -> None:
+    """ make a driver available by name; `entry_point` is 'module:class' """
+    if ':' not in entry_point:
+        raise ValueError(f'Invalid entry point: {entry_point}')
+    BACKENDS[name.casefold()] = entry_point
+    backend_class.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def detect_backend() -> str:
+    """ look for the hardware once and remember the result """
+    if _is_raspberrypi():
+        return 'ads1256'
+    found: List[str] = sorted(name for ids, name in PCI_BACKENDS.items() if ids in _pci_devices())
+    if len(found) > 1:
+        print(f'Found several ADC devices: {", ".join(found)}; using {found[-1]}. '
+              f'Set the backend explicitly to choose another one')
+    if found:
+        return found[-1]
+    if importlib.util.find_spec('ldev_dummy') is not None:
+        return 'dummy'
+    raise SystemError('No ADC device found')
+
+
+def backend_name(configured: Optional[str] = None) -> str:
+    """ the backend set in the environment or in the config, or the detected one; setting one skips the probing """
+    name: str = (os.environ.get('CRIMEA_ADC') or configured or '').strip().casefold()
+    if not name:
+        return detect_backend()
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown ADC backend: {name}; possible values are {", ".join(BACKENDS)}')
+    return name
+
+
+@lru_cache(maxsize=None)
+def backend_class(name: str) -> Type[ADC]:
+    module_name: str
+    class_name: str
+    module_name, class_name = BACKENDS[name].split(':', 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def device_class(backend: Optional[str] = None) -> Type[ADC]:
+    """ the driver for the backend named in the environment, in the config, or for the detected hardware """
+    return backend_class(backend_name(backend))
+
+
+def __getattr__(name: str) -> Any:
+    # `ADCDevice` used to be chosen on import; now the hardware is probed only when it's asked for
+    if name == 'ADCDevice':
+        return device_class()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+import time
+from math import isnan
+from typing import Any, Final, Iterable, List, Optional
+
+import numpy as np
+
+from adc import ADC
+
+__all__ = ['ADCSimulator']
+
+
+class ADCSimulator(ADC):
+    """ a radiometer on a plain computer: the voltages follow the antenna angle, with noise and overranges """
+
+    FULL_SCALE: Final[float] = 5.0  # V, where the real boards saturate
+
+    # the sky model: Tb(θ) = T_atm · (1 - exp(-τ / sin θ)), θ being the elevation
+    ATMOSPHERE_TEMPERATURE: Final[float] = 270.0  # K
+    BLACK_BODY_TEMPERATURE: Final[float] = 300.0  # K
+    BLACK_BODY_WIDTH: Final[float] = 5.0  # degrees, how far from its position the antenna still sees the black body
+    ZENITH_OPACITIES: Final[List[float]] = [0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 1.5]
+    GAIN: Final[float] = 0.01  # V/K
+    OFFSET: Final[float] = -1.5  # V
+
+    streaming: bool = True
+
+    def __init__(self, channels: Iterable[int], *, timeout: float = 0.1,
+                 sample_rate: float = 10_000., reading_rate: Optional[float] = None,
+                 noise: float = 0.01, overrange_rate: float = 0.,
+                 overrange_duration: float = 0.01, black_body_angle: float = 0.,
+                 seed: Optional[int] = None, **kwargs: Any) -> None:
+        """
+        `sample_rate` is the frames per second, `reading_rate` is the readings per second, each one being the median
+        of its frames, unless another filter is set; `noise` is the standard deviation of a sample in volts;
+        `overrange_rate` is the mean number of overrange events per second, each one lasting for `overrange_duration`
+        seconds
+        """
+        super().__init__(channels)
+        self._check_channels(self.channels)
+        if sample_rate <= 0.:
+            raise ValueError(f'Invalid sample rate: {sample_rate}')
+        if reading_rate is None:
+            reading_rate = 1. / timeout
+        if not 0. < reading_rate <= sample_rate:
+            raise ValueError(f'Invalid reading rate: {reading_rate}')
+
+        self.timeout: float = timeout
+        self.sample_rate: float = float(sample_rate)
+        self.noise: float = float(noise)
+        self.overrange_rate: float = float(overrange_rate)
+        self.overrange_duration: float = float(overrange_duration)
+        self.black_body_angle: float = float(black_body_angle)
+        self._rng: np.random.Generator = np.random.default_rng(seed)
+        self._opacities: np.ndarray = np.empty(0)
+        self._overrange_frames_left: int = 0
+        self._overrange_level: np.ndarray = np.empty(0)
+        self.frames_count: int = 0
+        self._apply_channels()
+        self.set_filter('median', reading_rate)
+
+    @property
+    def frame_rate(self) -> float:
+        return self.sample_rate
+
+    def _apply_channels(self) -> None:
+        self._opacities = np.array([self.ZENITH_OPACITIES[channel] for channel in self.channels])
+        self._overrange_frames_left = 0
+        self._overrange_level = np.zeros(len(self.channels))
+
+    def signal(self, angle: float) -> np.ndarray:
+        """ the noiseless voltages for the antenna at `angle` degrees of elevation """
+        if isnan(angle):
+            angle = 90.
+        brightness: np.ndarray
+        if abs(angle - self.black_body_angle) < self.BLACK_BODY_WIDTH:
+            brightness = np.full(len(self.channels), self.BLACK_BODY_TEMPERATURE)
+        elif angle <= 0. or angle >= 180.:
+            brightness = np.full(len(self.channels), self.ATMOSPHERE_TEMPERATURE)
+        else:
+            brightness = self.ATMOSPHERE_TEMPERATURE * (1. - np.exp(-self._opacities / np.sin(np.radians(angle))))
+        return self.OFFSET + self.GAIN * brightness
+
+    def _overrange(self, block: np.ndarray) -> None:
+        """ saturate some frames in place, the way a spark or a radar does to the real receiver """
+        frames_count: int = block.shape[0]
+        position: int = 0
+        while position < frames_count:
+            if self._overrange_frames_left:
+                count: int = min(self._overrange_frames_left, frames_count - position)
+                block[position:position + count] = self._overrange_level
+                self._overrange_frames_left -= count
+                position += count
+                continue
+            if self.overrange_rate <= 0.:
+                break
+            # the events come as a Poisson process
+            position += int(self._rng.exponential(self.sample_rate / self.overrange_rate))
+            if position < frames_count:
+                self._overrange_frames_left = max(1, round(self.overrange_duration * self.sample_rate))
+                self._overrange_level = self._rng.choice([-self.FULL_SCALE, self.FULL_SCALE], len(self.channels))
+
+    def generate(self, frames_count: int) -> np.ndarray:
+        """ the next `frames_count` frames in volts, as the streaming drivers pass them to `block_consumers` """
+        block: np.ndarray = np.empty((frames_count, len(self.channels)), dtype=np.float32)
+        block[:] = self.signal(self.antenna_angle)
+        if self.noise > 0.:
+            block += self._rng.normal(0., self.noise, block.shape).astype(np.float32)
+        self._overrange(block)
+        np.clip(block, -self.FULL_SCALE, self.FULL_SCALE, out=block)
+        return block
+
+    def run(self) -> None:
+        self._is_running = True
+        start_time: float = time.perf_counter()
+        self.frames_count = 0
+        try:
+            while self._is_running:
+                time.sleep(self.timeout)
+                now: float = time.perf_counter()
+                frames_count: int = int((now - start_time) * self.sample_rate) - self.frames_count
+                if frames_count <= 0:
+                    continue
+                with self._configuration_lock:
+                    self.publish_frames(self.generate(frames_count),
+                                        start_time + (self.frames_count + frames_count - 1) / self.sample_rate)
+                self.frames_count += frames_count
+        except (KeyboardInterrupt, SystemExit):
+            return
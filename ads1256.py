@@ -2,8 +2,11 @@
 
 import time
 from enum import IntEnum
-from typing import Dict, Final, Iterable, List, Literal, Union
+from math import nan
+from threading import Event
+from typing import Dict, Final, Iterable, List, Literal, Sequence, Tuple, Union
 
+import numpy as np
 from spidev import SpiDev
 # noinspection PyUnresolvedReferences
 from RPi import GPIO
@@ -21,6 +24,20 @@ DATA_READY_PIN: Final[int] = 17
 # SPI device, bus = 0, device = 0. Hardware defined. Do not change.
 SPI: SpiDev = SpiDev(0, 0)
 
+# Timing, see the datasheet, Table 9. CLKIN is 7.68 MHz. Rounded up to µs.
+T6_US: Final[int] = 7  # 50 τCLKIN: from the last SCLK edge of RDATA, RDATAC, or RREG till the first SCLK of the data
+T11_US: Final[int] = 4  # 24 τCLKIN: from the last SCLK edge of SYNC till the first SCLK of WAKEUP
+MAX_SPI_SPEED_HZ: Final[int] = 1_920_000  # τSCLK ≥ 4 τCLKIN
+# the settling time after the MUX switch, SYNC, and WAKEUP till DRDY goes low, by data rate, in µs;
+# see the datasheet, Table 13
+SETTLING_TIME_US: Final[Dict[Union[int, float], int]] = {
+    30000: 210, 15000: 250, 7500: 310, 3750: 440, 2000: 680, 1000: 1180, 500: 2180, 100: 10180,
+    60: 16840, 50: 20180, 30: 33510, 25: 40180, 15: 66840, 10: 100180, 5: 200180, 2.5: 400180,
+}
+
+# a transfer and the delay after it, in µs
+Transfer = Tuple[List[int], int]
+
 
 class ADS1256(ADC):
     # gain channel
@@ -89,15 +106,32 @@ class ADS1256(ADC):
         SINGLE = 0
         DIFFERENTIAL = 1
 
-    def __init__(self, channels: Iterable[int], *, timeout: float = 0.1) -> None:
+    def __init__(self, channels: Iterable[int], *, timeout: float = 0.1,
+                 gain: int = 1, data_rate: Union[int, float] = 30000, mode: Mode = Mode.DIFFERENTIAL,
+                 continuous: bool = False, spi_speed_hz: int = 1_000_000) -> None:
         super().__init__(channels)
         self.timeout: float = timeout
+        if gain not in self.GAIN:
+            raise ValueError(f'Invalid gain: {gain}; possible values are {", ".join(map(str, self.GAIN))}')
+        if data_rate not in self.DATA_RATE:
+            raise ValueError(f'Invalid data rate: {data_rate}; '
+                             f'possible values are {", ".join(map(str, self.DATA_RATE))}')
+        self.gain: int = gain
+        self.data_rate: Union[int, float] = data_rate
+        # in the continuous mode, the conversions are read as soon as DRDY falls, with no pause between the scans
+        self.continuous: bool = continuous
+        if not 0 < spi_speed_hz <= MAX_SPI_SPEED_HZ:
+            raise ValueError(f'Invalid SPI speed: {spi_speed_hz} Hz; it must not exceed {MAX_SPI_SPEED_HZ} Hz')
+        self.spi_speed_hz: int = spi_speed_hz
+        # full scale is ±2 VREF / PGA, VREF = 2.5 V
+        self._volts_per_count: float = 5.0 / self.gain / 0x7fffff
 
         self.rst_pin: Final[int] = RST_PIN
         self.cs_pin: Final[int] = CS_PIN
         self.cs_dac_pin: Final[int] = CS_DAC_PIN
         self.data_ready_pin: Final[int] = DATA_READY_PIN
-        self.scan_mode: ADS1256.Mode = self.Mode.DIFFERENTIAL
+        self.scan_mode: ADS1256.Mode = mode
+        self._check_channels(self.channels)
 
         GPIO.setmode(GPIO.BCM)
         GPIO.setwarnings(False)
@@ -106,8 +140,17 @@ class ADS1256(ADC):
         GPIO.setup(self.cs_pin, GPIO.OUT)
         # GPIO.setup(self.data_ready_pin, GPIO.IN)
         GPIO.setup(self.data_ready_pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-        SPI.max_speed_hz = 20000
+        SPI.max_speed_hz = self.spi_speed_hz
         SPI.mode = 0b01
+        # the MUX switch and the conversion read of every channel as a single chip-select period
+        self._switch_and_read: Dict[int, Tuple[Transfer, ...]] = {channel: self._switch_and_read_transfers(channel)
+                                                                  for channel in self.channels}
+
+        self._data_ready: Event = Event()
+        self._detecting_edges: bool = False
+        self._reading_continuously: bool = False
+        # the continuous mode has to be restarted for other channels
+        self._channels_changed: bool = True
 
         self.reset()
         chip_id = self.read_chip_id()
@@ -115,7 +158,7 @@ class ADS1256(ADC):
             print("ID Read succeeded")
         else:
             raise RuntimeError("ID Read failed")
-        self.config_adc(self.GAIN[1], self.DATA_RATE[30000])
+        self.config_adc(self.GAIN[self.gain], self.DATA_RATE[self.data_rate])
 
     def __del__(self) -> None:
         GPIO.cleanup()
@@ -128,24 +171,38 @@ class ADS1256(ADC):
         time.sleep(0.2)
         GPIO.output(self.rst_pin, GPIO.HIGH)
 
-    def _write_cmd(self, cmd: CMD) -> None:
+    def _transaction(self, *transfers: Transfer) -> List[int]:
+        """ run the transfers within a single chip-select period; return what the last one has read """
+        received: List[int] = []
         GPIO.output(self.cs_pin, GPIO.LOW)  # cs  0
-        SPI.writebytes([cmd])
-        GPIO.output(self.cs_pin, GPIO.HIGH)  # cs 1
+        try:
+            data: List[int]
+            delay_us: int
+            for data, delay_us in transfers:
+                received = SPI.xfer2(data, self.spi_speed_hz, delay_us)
+        finally:
+            GPIO.output(self.cs_pin, GPIO.HIGH)  # cs 1
+        return received
+
+    def _write_cmd(self, cmd: CMD) -> None:
+        self._transaction(([cmd], 0))
 
     def write_reg(self, reg: REG, data) -> None:
-        GPIO.output(self.cs_pin, GPIO.LOW)  # cs  0
-        SPI.writebytes([self.CMD.WRITE_REG | reg, 0x00, data])
-        GPIO.output(self.cs_pin, GPIO.HIGH)  # cs 1
+        self._transaction(([self.CMD.WRITE_REG | reg, 0x00, data], 0))
 
-    def read_data(self, reg: REG) -> bytes:
-        GPIO.output(self.cs_pin, GPIO.LOW)  # cs  0
-        SPI.writebytes([self.CMD.READ_REG | reg, 0x00])
-        data = SPI.readbytes(1)
-        GPIO.output(self.cs_pin, GPIO.HIGH)  # cs 1
-        return data
+    def read_data(self, reg: REG) -> List[int]:
+        return self._transaction(([self.CMD.READ_REG | reg, 0x00], T6_US), ([0x00], 0))
+
+    def _on_data_ready(self, _channel: int) -> None:
+        self._data_ready.set()
 
     def _wait_for_data(self) -> None:
+        if self._detecting_edges:
+            # clear first not to miss the edge that comes right after the pin check
+            self._data_ready.clear()
+            if GPIO.input(self.data_ready_pin) != 0 and not self._data_ready.wait(4.):
+                raise TimeoutError
+            return
         for i in range(0, 400):
             if GPIO.input(self.data_ready_pin) == 0:
                 break
@@ -170,74 +227,150 @@ class ADS1256(ADC):
         buf[2] = (0 << 5) | (0 << 3) | (gain << 0)
         buf[3] = data_rate
 
-        GPIO.output(self.cs_pin, GPIO.LOW)  # cs  0
-        SPI.writebytes([self.CMD.WRITE_REG, 0x03])
-        SPI.writebytes(buf)
-
-        GPIO.output(self.cs_pin, GPIO.HIGH)  # cs 1
+        self._transaction(([self.CMD.WRITE_REG, 0x03] + buf[:4], 0))
         time.sleep(0.001)
 
-    def _set_channel(self, channel: Literal[0, 1, 2, 3, 4, 5, 6, 7]) -> None:
-        if channel not in [0, 1, 2, 3, 4, 5, 6, 7]:
-            raise ValueError(f'Invalid channel: {channel}')
-        self.write_reg(self.REG.MUX, (channel << 4) | (1 << 3))
-
-    def _set_diff_channel(self, channel: Literal[0, 1, 2, 3]) -> None:
-        if channel not in [0, 1, 2, 3]:
-            raise ValueError(f'Invalid channel: {channel}')
-        self.write_reg(self.REG.MUX, ((channel * 2) << 4) | (channel * 2 + 1))
-        # print(f'DiffChannel   AIN{channel * 2}-AIN{channel * 2 + 1}')
+    def _mux(self, channel: Literal[0, 1, 2, 3, 4, 5, 6, 7]) -> int:
+        """ the MUX register value to measure the channel in the current scan mode """
+        if self.scan_mode == ADS1256.Mode.SINGLE:  # Single-ended input with 8 channels
+            if channel not in [0, 1, 2, 3, 4, 5, 6, 7]:
+                raise ValueError(f'Invalid channel: {channel}')
+            return (channel << 4) | (1 << 3)
+        elif self.scan_mode == ADS1256.Mode.DIFFERENTIAL:  # Differential input with 4 channels
+            if channel not in [0, 1, 2, 3]:
+                raise ValueError(f'Invalid channel: {channel}')
+            return ((channel * 2) << 4) | (channel * 2 + 1)
+        else:
+            raise ValueError(f'Invalid mode: {self.scan_mode}')
 
     def set_mode(self, mode: Mode) -> None:
-        self.scan_mode = mode
+        """ switch between the single-ended and the differential inputs; the channels must exist in the new mode """
+        with self._configuration_lock:
+            previous_mode: ADS1256.Mode = self.scan_mode
+            self.scan_mode = mode
+            try:
+                self._check_channels(self.channels)
+            except ValueError:
+                self.scan_mode = previous_mode
+                raise
+            self._apply_channels()
+
+    @property
+    def streaming(self) -> bool:
+        return self.continuous
+
+    @property
+    def frame_rate(self) -> float:
+        if not self.continuous:
+            return nan
+        if len(self.channels) == 1:
+            return float(self.data_rate)
+        # the scan switches the MUX every conversion: each waits for the switch transfers and the full settling
+        switch_time: float = max(sum(len(data) * 8. / self.spi_speed_hz + delay * 1e-6 for data, delay in transfers)
+                                 for transfers in self._switch_and_read.values())
+        return 1. / (len(self.channels) * (SETTLING_TIME_US[self.data_rate] * 1e-6 + switch_time))
+
+    def _check_channels(self, channels: List[int]) -> None:
+        super()._check_channels(channels)
+        for channel in channels:
+            self._mux(channel)
+
+    def _apply_channels(self) -> None:
+        self._switch_and_read = {channel: self._switch_and_read_transfers(channel) for channel in self.channels}
+        self._channels_changed = True
+
+    def _decode(self, buf: Sequence[int]) -> float:
+        return int.from_bytes(bytes(buf), 'big', signed=True) * self._volts_per_count
+
+    def _switch_transfers(self, channel: Literal[0, 1, 2, 3, 4, 5, 6, 7]) -> Tuple[Transfer, ...]:
+        """ switch the MUX to the channel and restart the conversion """
+        switch: List[int] = [self.CMD.WRITE_REG | self.REG.MUX, 0x00, self._mux(channel), self.CMD.SYNC]
+        # t11 counts till the first SCLK of WAKEUP, so clocking WAKEUP in is no pause
+        return (switch, T11_US), ([self.CMD.WAKEUP], 0)
+
+    def _switch_and_read_transfers(self, channel: Literal[0, 1, 2, 3, 4, 5, 6, 7]) -> Tuple[Transfer, ...]:
+        """ switch the MUX to the channel, restart the conversion, and read the result of the previous one """
+        switch: Tuple[Transfer, ...] = self._switch_transfers(channel)
+        return switch[:-1] + ((switch[-1][0] + [self.CMD.READ_DATA], T6_US), ([0x00] * 3, 0))
+
+    def _read_data(self) -> float:
+        """ read the latest conversion result; DRDY must be low """
+        return self._decode(self._transaction(([self.CMD.READ_DATA], T6_US), ([0x00] * 3, 0)))
 
     def read_adc_data(self) -> float:
         self._wait_for_data()
-        GPIO.output(self.cs_pin, GPIO.LOW)  # cs  0
-        SPI.writebytes([self.CMD.READ_DATA])
-        # time.sleep(0.01)
-
-        buf: bytes = SPI.readbytes(3)
-        GPIO.output(self.cs_pin, GPIO.HIGH)  # cs 1
-        read: int = (buf[0] << 16) & 0xff0000
-        read |= (buf[1] << 8) & 0xff00
-        read |= (buf[2]) & 0xff
-        if read & 0x800000:
-            read &= 0xf000000
-        return read * 5.0 / 0x7fffff
+        return self._read_data()
 
     def get_channel_value(self, channel: Literal[0, 1, 2, 3, 4, 5, 6, 7]) -> float:
-        value: float
-        if self.scan_mode == ADS1256.Mode.SINGLE:  # Single-ended input with 8 channels
-            if channel >= 8:
-                raise ValueError(f'Invalid channel: {channel}')
-            self._set_channel(channel)
-            self._write_cmd(self.CMD.SYNC)
-            # time.sleep(0.01)
-            self._write_cmd(self.CMD.WAKEUP)
-            # time.sleep(0.2)
-            value = self.read_adc_data()
-        elif self.scan_mode == ADS1256.Mode.DIFFERENTIAL:  # Differential input with 4 channels
-            if channel >= 4:
-                raise ValueError(f'Invalid channel: {channel}')
-            self._set_diff_channel(channel)
-            self._write_cmd(self.CMD.SYNC)
-            # time.sleep(0.01)
-            self._write_cmd(self.CMD.WAKEUP)
-            # time.sleep(0.01)
-            value = self.read_adc_data()
-        else:
-            raise ValueError(f'Invalid mode: {self.scan_mode}')
-        return value
+        self._transaction(*self._switch_transfers(channel))
+        return self.read_adc_data()
+
+    def _start_reading_continuously(self) -> None:
+        """ for a single channel: convert continuously and get the data without any commands """
+        self._wait_for_data()
+        self._transaction(*self._switch_transfers(self.channels[0]))
+        self._wait_for_data()
+        self._transaction(([self.CMD.READ_DATA_CONTINUOUSLY], 0))
+        self._reading_continuously = True
+
+    def _stop_reading_continuously(self) -> None:
+        if self._reading_continuously:
+            self._wait_for_data()
+            self._write_cmd(self.CMD.STOP_READING_DATA_CONTINUOUSLY)
+            self._reading_continuously = False
+
+    def _read_continuously(self) -> float:
+        self._wait_for_data()
+        return self._decode(self._transaction(([0x00] * 3, 0)))
+
+    def _start_scanning(self) -> None:
+        self._wait_for_data()
+        self._transaction(*self._switch_transfers(self.channels[0]))
+
+    def _scan(self) -> List[float]:
+        """ switch the MUX to the next channel while the conversion of the current one is ready to be read """
+        values: List[float] = []
+        next_channel: Literal[0, 1, 2, 3, 4, 5, 6, 7]
+        for next_channel in self.channels[1:] + self.channels[:1]:
+            self._wait_for_data()
+            values.append(self._decode(self._transaction(*self._switch_and_read[next_channel])))
+        return values
+
+    def _run_continuously(self) -> None:
+        GPIO.add_event_detect(self.data_ready_pin, GPIO.FALLING, callback=self._on_data_ready)
+        self._detecting_edges = True
+        self._channels_changed = True
+        # the frames waiting for the filter
+        frames: List[List[float]] = []
+        try:
+            while self._is_running:
+                with self._configuration_lock:
+                    if self._channels_changed:
+                        self._channels_changed = False
+                        frames.clear()
+                        self._stop_reading_continuously()
+                        if len(self.channels) == 1:
+                            self._start_reading_continuously()
+                        else:
+                            self._start_scanning()
+                    frames.append([self._read_continuously()] if self._reading_continuously else self._scan())
+                    if len(frames) >= (1 if self.decimator is None else self.decimator.factor):
+                        self.publish_frames(np.array(frames, dtype=np.float32))
+                        frames.clear()
+        finally:
+            self._stop_reading_continuously()
+            GPIO.remove_event_detect(self.data_ready_pin)
+            self._detecting_edges = False
 
     def run(self):
         self._is_running = True
         try:
+            if self.continuous:
+                self._run_continuously()
             while self._is_running:
-                index: int
                 channel: Literal[0, 1, 2, 3, 4, 5, 6, 7]
-                for index, channel in enumerate(self.channels):
-                    self.voltages[index] = self.get_channel_value(channel)
+                with self._configuration_lock:
+                    self.publish([self.get_channel_value(channel) for channel in self.channels])
                 time.sleep(self.timeout)
         except (KeyboardInterrupt, SystemExit):
             return
@@ -139,6 +139,8 @@ class DataItem:
         self.timestamp: float = data['timestamp']
         self.voltage: Optional[np.ndarray] = np.array(data.get('voltage')) if data.get('voltage', []) else None
         self.channels: int = self.voltage.shape[0] if self.voltage is not None else 0
+        # the per-channel count, mean, and overranges taken during the dwell, in newer files
+        self.voltage_statistics: Dict[str, RawDataValueType] = data.get('voltage statistics', dict())
         self.angle: float = data.get('angle', np.nan)
 
         self.weather: Dict[str, Union[None, int, float, str, List[int]]] = data.get('weather', dict())
@@ -382,14 +384,25 @@ def process(data: Data, ch: int, principal_angles: PrincipalAngles) -> Processin
     for item in data:
         channels_count = max(channels_count, item.channels)
         if item.channels > ch and len(item.voltage[ch]) > 0:
-            if np.any(item.voltage[ch] > 5.0) and np.any(item.voltage[ch] < -5.0):
+            overrange_high: bool
+            overrange_low: bool
+            mean: float
+            if len(item.voltage_statistics.get('mean', [])) > ch:
+                overrange_high = item.voltage_statistics['overrange']['high'][ch] > 0
+                overrange_low = item.voltage_statistics['overrange']['low'][ch] > 0
+                mean = item.voltage_statistics['mean'][ch]
+            else:
+                overrange_high = bool(np.any(item.voltage[ch] > 5.0))
+                overrange_low = bool(np.any(item.voltage[ch] < -5.0))
+                mean = float(np.mean(item.voltage[ch]))
+            if overrange_high and overrange_low:
                 angles_data[item.angle] = np.nan
-            elif np.any(item.voltage[ch] > 5.0):
+            elif overrange_high:
                 angles_data[item.angle] = np.inf
-            elif np.any(item.voltage[ch] < -5.0):
+            elif overrange_low:
                 angles_data[item.angle] = -np.inf
             else:
-                angles_data[item.angle] = float(np.mean(item.voltage[ch]))
+                angles_data[item.angle] = mean
 
     absorptions: Dict[str, float]
     absorption_labels: Optional[PrincipalAnglesAbsorptionLabels] = None
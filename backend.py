@@ -1,17 +1,40 @@
 # -*- coding: utf-8 -*-
 
+import sys
 import time
 from datetime import datetime
-from threading import Thread
-from typing import Any, Callable, Iterable, List, Optional, Tuple
+from math import isnan, nan
+from multiprocessing import get_context
+from multiprocessing.connection import Connection
+from multiprocessing.context import BaseContext
+from multiprocessing.process import BaseProcess
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
 
 import adc
+import filters
+from buffers import GrowableBuffer
+from recorder import StreamRecorder
+from running_stats import RunningStatistics, TimingStatistics
+from shared_ring import SharedRingWriter
+from sweep import SweepOrigin
 
 
 class ADCAcquisition(Thread):
-    def __init__(self, adc_channels: Iterable[int], measurement_completed_callback: Callable[[], None]) -> None:
+    # how long to wait for a driver reading before checking whether the dwell is over
+    READING_TIMEOUT: float = 0.1
+    # how long a counted dwell may run over its expected duration before it is cut short
+    COUNTED_DWELL_GRACE: float = 1.0
+
+    def __init__(self, adc_channels: Iterable[int], measurement_completed_callback: Callable[[], None],
+                 adc_backend: Optional[str] = None, *, shared_memory: Optional[str] = None,
+                 recording: Optional[Dict[str, Any]] = None, **adc_options: Any) -> None:
+        """
+        with `shared_memory` set, the frames are published for other local processes under that name;
+        with `recording` set, they are written to disk by `StreamRecorder(**recording)`
+        """
         super().__init__()
         self.daemon = True
 
@@ -19,20 +42,53 @@ class ADCAcquisition(Thread):
         self._closing: bool = False
         self.targets: List[Tuple[Callable, Tuple[Any, ...]]] = []
 
-        self._adc: adc.ADC = adc.ADCDevice(channels=adc_channels, timeout=0.1)
+        adc_options.setdefault('timeout', 0.1)
+        self._adc: adc.ADC = adc.device_class(adc_backend)(channels=adc_channels, **adc_options)
+        self._shared_ring: Optional[SharedRingWriter] = None
+        if shared_memory:
+            self._shared_ring = SharedRingWriter(shared_memory)
+            self._shared_ring.configure(self._adc.channels, self._adc.block_frame_rate)
+            self._adc.block_consumers.append(self._shared_ring.write)
+        self._recorder: Optional[StreamRecorder] = None
+        if recording:
+            self._recorder = StreamRecorder(**recording)
+            self._recorder.configure(self._adc.channels, self._adc.block_frame_rate)
+            self._recorder.start()
+            self._adc.block_consumers.append(self._recorder.write)
         self._adc.start()
 
         self._start_time: Optional[float] = None
         self._stop_time: Optional[float] = None
+        # how many readings a counted dwell still needs, None for a timed one
+        self._readings_left: Optional[int] = None
+        self._last_sequence: int = 0
+        self.missed_readings: int = 0
+        # between the readings of a dwell, and from a reading to its acceptance here
+        self._intervals: TimingStatistics = TimingStatistics()
+        self._latencies: TimingStatistics = TimingStatistics()
+        self._previous_timestamp: float = nan
 
         self.current_x: datetime = datetime.now()
-        self.current_y: List[np.ndarray] = [np.empty(0)] * len(self._adc.channels)
+        # `time.time() - time.perf_counter()` at the beginning of the dwell
+        self._epoch_offset: float = time.time() - time.perf_counter()
+        self.samples: GrowableBuffer = GrowableBuffer(dtype=self.sample_dtype(len(self._adc.channels)))
+        self._voltages: RunningStatistics = RunningStatistics(len(self._adc.channels))
 
         self.measurement_completed_callback: Callable[[], None] = measurement_completed_callback
 
+    @staticmethod
+    def sample_dtype(channels_count: int) -> np.dtype:
+        """ the epoch time of a sample and the voltages of all the channels, 8 + 4 × `channels_count` bytes """
+        return np.dtype([('time', np.float64), ('voltage', np.float32, (channels_count,))])
+
     def close(self) -> None:
         self._adc.stop()
         self._adc.join()
+        if self._shared_ring is not None:
+            self._shared_ring.close()
+        if self._recorder is not None:
+            self._recorder.stop()
+            self._recorder.join()
         self._is_running = False
         self._closing = True
 
@@ -40,37 +96,99 @@ class ADCAcquisition(Thread):
         self._is_running = bool(is_running)
 
     def set_channels(self, new_channels: Iterable[int]) -> None:
+        """ reprogram the running driver; the readings taken before are dropped, for they have the old layout """
         self._is_running = False
-        self._adc.stop()
-        self._adc.join()
-        self._adc = adc.ADCDevice(channels=new_channels, timeout=0.1)
-        self.current_y = [np.empty(0)] * len(self._adc.channels)
-        self._adc.start()
+        self._adc.reconfigure(new_channels)
+        self._configure_consumers()
+        self._last_sequence = self._adc.sequence
+        self.samples = GrowableBuffer(dtype=self.sample_dtype(len(self._adc.channels)))
+        self._voltages = RunningStatistics(len(self._adc.channels))
+
+    def set_filter(self, name: Optional[str], output_rate: float = 10., **options: Any) -> None:
+        """ see `adc.ADC.set_filter` """
+        self._adc.set_filter(name, output_rate, **options)
+        self._configure_consumers()
+
+    def _configure_consumers(self) -> None:
+        """ tell the block consumers the new layout of the frames """
+        if self._shared_ring is not None:
+            self._shared_ring.configure(self._adc.channels, self._adc.block_frame_rate)
+        if self._recorder is not None:
+            self._recorder.configure(self._adc.channels, self._adc.block_frame_rate)
 
     def done(self) -> bool:
         return not self.targets
 
-    def measure(self, delay, duration) -> None:
+    def timing_statistics(self) -> Dict[str, Dict[str, float]]:
+        """ how regular the readings of the last dwell were, and how late they were taken, in seconds """
+        return {'interval': self._intervals.as_dict(), 'latency': self._latencies.as_dict(),
+                'missed': {'count': self.missed_readings}}
+
+    def voltage_statistics(self) -> Dict[str, Any]:
+        """ the per-channel statistics of the samples of the last dwell, see `RunningStatistics.as_dict` """
+        return self._voltages.as_dict()
+
+    def measure(self, delay, duration, angle: float = nan, counted: bool = False,
+                sweep: Optional[SweepOrigin] = None) -> None:
+        """
+        take the readings from `delay` seconds on for `duration` seconds; a `counted` dwell takes exactly as many
+        consecutive readings as the driver yields in `duration`, their times coming from the frame count;
+        during a `sweep`, the antenna turns rather than stays at `angle`
+        """
+        self._adc.antenna_angle = angle
+        self._adc.antenna_sweep = sweep
         self._start_time = time.perf_counter() + delay
         self._stop_time = self._start_time + duration
+        self._readings_left = None
+        if counted:
+            self._readings_left = max(1, round(duration / self._adc.reading_period))
+            self._stop_time += duration + self.COUNTED_DWELL_GRACE
+        self._last_sequence = self._adc.sequence
         self.current_x = datetime.now()
+        self._epoch_offset = time.time() - time.perf_counter()
+        self._intervals = TimingStatistics()
+        self._latencies = TimingStatistics()
+        self._previous_timestamp = nan
+        self._voltages = RunningStatistics(len(self._adc.channels))
         self.set_running(True)
 
+    def _accept(self, reading: adc.Reading) -> None:
+        if reading.sequence > self._last_sequence + 1:
+            self.missed_readings += reading.sequence - self._last_sequence - 1
+        self._last_sequence = reading.sequence
+        if reading.timestamp >= self._start_time and (reading.timestamp <= self._stop_time
+                                                      if self._readings_left is None else self._readings_left > 0):
+            if len(reading.voltages) != self.samples.dtype['voltage'].shape[0]:
+                return  # taken before the channels changed
+            if self._readings_left is not None:
+                self._readings_left -= 1
+            self._latencies.add(time.perf_counter() - reading.timestamp)
+            if not isnan(self._previous_timestamp):
+                self._intervals.add(reading.timestamp - self._previous_timestamp)
+            self._previous_timestamp = reading.timestamp
+            voltages: List[float] = [nan if v is None else v for v in reading.voltages]
+            self.samples.append((reading.timestamp + self._epoch_offset, voltages))
+            self._voltages.add(np.array(voltages))
+
+    def _collect(self) -> None:
+        """ wait for the driver readings till the dwell is over, never taking the same reading twice """
+        while self._is_running and not self._closing:
+            reading: adc.Reading
+            for reading in self._adc.readings_since(self._last_sequence, timeout=self.READING_TIMEOUT):
+                self._accept(reading)
+            if self._readings_left == 0:
+                break
+            if time.perf_counter() > self._stop_time:
+                if self._readings_left is not None:
+                    print(f'The dwell is {self._readings_left} readings short', file=sys.stderr)
+                break
+
     def run(self) -> None:
         try:
             while not self._closing:
                 if self._is_running and self._stop_time is not None:
-                    while self._is_running and time.perf_counter() <= self._stop_time and not self._closing:
-                        if time.perf_counter() >= self._start_time:
-                            for ch in self._adc.channels:
-                                v = self._adc.voltages[ch]
-                                if v is not None:
-                                    self.current_y[ch] = np.concatenate((self.current_y[ch], np.array([v])))
-                        if self._is_running and time.perf_counter() <= self._stop_time and not self._closing:
-                            time.sleep(0.1)
-                        elif self._is_running and time.perf_counter() <= self._start_time and not self._closing:
-                            time.sleep(0.01)
-                    else:
+                    self._collect()
+                    if not self._closing:
                         self.measurement_completed_callback()
                 elif not self._closing:
                     if self.targets:
@@ -81,3 +199,173 @@ class ADCAcquisition(Thread):
                         time.sleep(0.1)
         except (KeyboardInterrupt, SystemExit):
             return
+
+
+def _serve_acquisition(connection: Connection, adc_channels: List[int], adc_backend: Optional[str],
+                       shared_memory: Optional[str], recording: Optional[Dict[str, Any]],
+                       adc_options: Dict[str, Any]) -> None:
+    """ run `ADCAcquisition` in a child process, taking the commands from the pipe and sending the dwells back """
+    acquisition: ADCAcquisition
+
+    def measurement_completed() -> None:
+        acquisition.set_running(False)
+        connection.send(('completed', acquisition.samples.data.copy(), acquisition.timing_statistics(),
+                         acquisition.voltage_statistics(), acquisition.missed_readings))
+        acquisition.samples.clear()
+
+    try:
+        acquisition = ADCAcquisition(adc_channels, measurement_completed, adc_backend,
+                                     shared_memory=shared_memory, recording=recording, **adc_options)
+    except Exception as ex:
+        connection.send(('error', f'{ex.__class__.__name__}: {ex}'))
+        return
+    acquisition.start()
+    connection.send(('ready', acquisition.samples.dtype))
+    try:
+        while True:
+            command: str
+            args: Tuple[Any, ...]
+            command, *args = connection.recv()
+            if command == 'close':
+                break
+            if command == 'set_filter':
+                name, output_rate, options = args
+                try:
+                    acquisition.set_filter(name, output_rate, **options)
+                except ValueError as ex:
+                    print(ex)
+                continue
+            getattr(acquisition, command)(*args)
+            if command == 'set_channels':
+                connection.send(('channels', acquisition.samples.dtype))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        acquisition.close()
+        acquisition.join()
+
+
+class ADCAcquisitionProcess(Thread):
+    """
+    the same as `ADCAcquisition`, but the driver and the acquisition run in a child process, away from the GIL of the
+    GUI; the motor routines in `targets` and `measurement_completed_callback` run in this thread, as they do there
+    """
+
+    # how long to wait for a message from the child process before checking for the `targets`
+    MESSAGE_TIMEOUT: float = 0.1
+
+    def __init__(self, adc_channels: Iterable[int], measurement_completed_callback: Callable[[], None],
+                 adc_backend: Optional[str] = None, *, shared_memory: Optional[str] = None,
+                 recording: Optional[Dict[str, Any]] = None, **adc_options: Any) -> None:
+        super().__init__()
+        self.daemon = True
+
+        self._is_running: bool = False
+        self._closing: bool = False
+        self.targets: List[Tuple[Callable, Tuple[Any, ...]]] = []
+
+        # don't fork the GUI with all its threads
+        context: BaseContext = get_context('spawn')
+        self._connection: Connection
+        child_connection: Connection
+        self._connection, child_connection = context.Pipe()
+        self._sending: Lock = Lock()
+        self._process: BaseProcess = context.Process(target=_serve_acquisition, daemon=True,
+                                                     args=(child_connection, list(adc_channels), adc_backend,
+                                                           shared_memory, recording, adc_options))
+        self._process.start()
+        child_connection.close()
+        message: Tuple[Any, ...] = self._connection.recv()
+        if message[0] != 'ready':
+            self._process.join()
+            raise RuntimeError(f'The acquisition process failed to start: {message[1]}')
+
+        self.missed_readings: int = 0
+        self._timing_statistics: Dict[str, Dict[str, float]] = {}
+        self._voltage_statistics: Dict[str, Any] = {}
+        self.current_x: datetime = datetime.now()
+        self.samples: GrowableBuffer = GrowableBuffer(dtype=message[1])
+
+        self.measurement_completed_callback: Callable[[], None] = measurement_completed_callback
+
+    def _send(self, command: str, *args: Any) -> None:
+        with self._sending:
+            self._connection.send((command, *args))
+
+    def close(self) -> None:
+        self._closing = True
+        self._is_running = False
+        try:
+            self._send('close')
+        except (BrokenPipeError, OSError):
+            pass
+        self._process.join(timeout=5.)
+
+    def set_running(self, is_running: bool) -> None:
+        self._is_running = bool(is_running)
+        self._send('set_running', self._is_running)
+
+    def set_channels(self, new_channels: Iterable[int]) -> None:
+        self._is_running = False
+        self._send('set_channels', list(new_channels))
+
+    def set_filter(self, name: Optional[str], output_rate: float = 10., **options: Any) -> None:
+        """ see `adc.ADC.set_filter` """
+        if name:
+            # fail early on a wrong name or options, here rather than in the child process
+            filters.make_decimator(name, output_rate, output_rate, **options)
+        self._send('set_filter', name, output_rate, options)
+
+    def done(self) -> bool:
+        return not self.targets
+
+    def timing_statistics(self) -> Dict[str, Dict[str, float]]:
+        return self._timing_statistics
+
+    def voltage_statistics(self) -> Dict[str, Any]:
+        return self._voltage_statistics
+
+    def measure(self, delay, duration, angle: float = nan, counted: bool = False,
+                sweep: Optional[SweepOrigin] = None) -> None:
+        self.current_x = datetime.now()
+        self._is_running = True
+        self._send('measure', delay, duration, angle, counted, sweep)
+
+    def _handle(self, message: Tuple[Any, ...]) -> None:
+        kind: str = message[0]
+        if kind == 'completed':
+            samples: np.ndarray
+            samples, self._timing_statistics, self._voltage_statistics, self.missed_readings = message[1:]
+            self.samples = GrowableBuffer(capacity=samples.shape[0], dtype=samples.dtype)
+            self.samples.extend(samples)
+            if not self._closing:
+                self.measurement_completed_callback()
+        elif kind == 'channels':
+            self.samples = GrowableBuffer(dtype=message[1])
+
+    def run(self) -> None:
+        try:
+            while not self._closing:
+                if self._connection.poll(self.MESSAGE_TIMEOUT):
+                    self._handle(self._connection.recv())
+                elif not self._is_running and self.targets:
+                    _target, _args = self.targets[0]
+                    _target(*_args)
+                    self.targets.pop(0)
+        except (EOFError, OSError):
+            if not self._closing:
+                print('The acquisition process has gone', file=sys.stderr)
+        except (KeyboardInterrupt, SystemExit):
+            return
+
+
+def dwell_record(acquisition: Union[ADCAcquisition, ADCAcquisitionProcess]) -> Dict[str, Any]:
+    """ the samples and the statistics of the last dwell, the way they are saved """
+    samples: np.ndarray = acquisition.samples.data
+    return {
+        'sample_times': samples['time'].tolist(),
+        # float32 holds about 7 significant digits; don't let JSON pretend there are more
+        'voltage': [[float(f'{v:.7g}') for v in channel] for channel in samples['voltage'].T.tolist()],
+        'acquisition timing': acquisition.timing_statistics(),
+        'voltage statistics': acquisition.voltage_statistics(),
+    }
@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import argparse
+import ctypes
+import gc
+import gzip
+import itertools
+import json
+import tempfile
+import time
+import tracemalloc
+from threading import Event, Thread
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from adc import as_frames
+from backend import ADCAcquisition, ADCAcquisitionProcess, dwell_record
+from buffers import GrowableBuffer
+from filters import FILTERS, make_decimator
+from recorder import StreamRecorder
+
+
+def _time_it(function: Callable[[], None], repeat: int = 3) -> float:
+    best: float = np.inf
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_append(dwell_lengths: List[int]) -> Dict[str, List[float]]:
+    """ the cost of accumulating one dwell worth of samples, one sample at a time """
+
+    def concatenate(count: int) -> None:
+        y: np.ndarray = np.empty(0)
+        for v in range(count):
+            y = np.concatenate((y, np.array([v])))
+
+    def growable_buffer(count: int) -> None:
+        y: GrowableBuffer = GrowableBuffer()
+        for v in range(count):
+            y.append(v)
+
+    results: Dict[str, List[float]] = {'np.concatenate': [], 'GrowableBuffer': []}
+    count: int
+    for count in dwell_lengths:
+        results['np.concatenate'].append(_time_it(lambda: concatenate(count)) / count)
+        results['GrowableBuffer'].append(_time_it(lambda: growable_buffer(count)) / count)
+    return results
+
+
+def bench_dma_median(channel_counts: List[int], buffer_size: int = 64 * 1024) -> Dict[str, List[float]]:
+    """ the cost of reducing an L780/L791 DMA buffer to per-channel medians, per tick """
+    buffer = (ctypes.c_uint16 * buffer_size)(*np.random.randint(0, 1 << 14, buffer_size).tolist())
+    pointer = ctypes.cast(buffer, ctypes.POINTER(ctypes.c_uint16))
+
+    def python_lists(channels_count: int) -> None:
+        # what the drivers used to do
+        for index in range(channels_count):
+            raw_data: List[int] = pointer[index * 2:buffer_size:2 * channels_count]
+            raw_data.sort()
+            count: int = len(raw_data)
+            if count & 1:
+                _ = float(raw_data[count // 2]) * 10. / (1 << 14)
+            else:
+                _ = (0.5 * raw_data[count // 2] + 0.5 * raw_data[count // 2 - 1]) * 10. / (1 << 14)
+
+    def numpy_view(channels_count: int) -> None:
+        frames: np.ndarray = as_frames(pointer, buffer_size, 2 * channels_count)[:, ::2]
+        _ = (np.median(frames, axis=0) * (10. / (1 << 14))).tolist()
+
+    results: Dict[str, List[float]] = {'Python lists': [], 'NumPy view': []}
+    channels_count: int
+    for channels_count in channel_counts:
+        results['Python lists'].append(_time_it(lambda: python_lists(channels_count)))
+        results['NumPy view'].append(_time_it(lambda: numpy_view(channels_count)))
+    return results
+
+
+def bench_filters(channel_counts: List[int], input_rate: float = 200e3, output_rate: float = 10.,
+                  block_size: int = 16 * 1024) -> Dict[str, List[float]]:
+    """ how many samples per second a single core can filter, streamed in blocks as the L791 does """
+    results: Dict[str, List[float]] = {name: [] for name in FILTERS}
+    channels_count: int
+    for channels_count in channel_counts:
+        block: np.ndarray = np.random.normal(0., 1., (block_size, channels_count)).astype(np.float32)
+        blocks_count: int = max(1, round(input_rate / block_size))  # about a second of the stream
+
+        def stream() -> None:
+            for index in range(blocks_count):
+                decimator.process(block, float(index))
+
+        name: str
+        for name in FILTERS:
+            decimator = make_decimator(name, input_rate, output_rate)
+            results[name].append(blocks_count * block_size * channels_count / _time_it(stream))
+    return results
+
+
+def bench_acquisition_jitter(modes: Dict[str, type], dwell: float = 2., reading_rate: float = 100.,
+                             load: bool = True) -> Dict[str, List[float]]:
+    """ the reading latency of the simulated ADC in the acquisition thread or process, with the GIL busy or not """
+
+    def hog_the_gil() -> None:
+        # what matplotlib redraws and JSON packing do to the interpreter
+        while not stop.is_set():
+            sum(range(100_000))
+
+    results: Dict[str, List[float]] = {'latency mean': [], 'latency std': [], 'latency max': [], 'interval std': []}
+    name: str
+    acquisition_class: type
+    for name, acquisition_class in modes.items():
+        completed: Event = Event()
+        acquisition = acquisition_class([0, 1], completed.set, 'simulator', reading_rate=reading_rate, timeout=0.01)
+        acquisition.start()
+        stop: Event = Event()
+        if load:
+            Thread(target=hog_the_gil, daemon=True).start()
+        acquisition.measure(0.1, dwell)
+        completed.wait(dwell + 5.)
+        stop.set()
+        acquisition.set_running(False)
+        statistics: Dict[str, Dict[str, float]] = acquisition.timing_statistics()
+        acquisition.close()
+        results['latency mean'].append(statistics['latency']['mean'])
+        results['latency std'].append(statistics['latency']['std'])
+        results['latency max'].append(statistics['latency']['max'])
+        results['interval std'].append(statistics['interval']['std'])
+    return results
+
+
+def bench_recorder(channel_counts: List[int], block_size: int = 16 * 1024,
+                   duration: float = 2.) -> Dict[str, List[float]]:
+    """ how many samples per second go to the disk, and how many get dropped, with the blocks coming at once """
+    results: Dict[str, List[float]] = {'written': [], 'dropped': []}
+    channels_count: int
+    for channels_count in channel_counts:
+        block: np.ndarray = np.random.normal(0., 1., (block_size, channels_count)).astype(np.float32)
+        with tempfile.TemporaryDirectory() as folder:
+            recorder: StreamRecorder = StreamRecorder(folder)
+            # the rate only sizes the files here
+            recorder.configure(list(range(channels_count)), 200e3 / channels_count)
+            recorder.start()
+            blocks_count: int = 0
+            start_time: float = time.perf_counter()
+            while time.perf_counter() - start_time < duration:
+                recorder.write(block, time.perf_counter())
+                blocks_count += 1
+                time.sleep(0.001)
+            recorder.stop()
+            recorder.join()
+            elapsed: float = time.perf_counter() - start_time
+        results['written'].append((blocks_count * block_size - recorder.dropped_frames) * channels_count / elapsed)
+        results['dropped'].append(recorder.dropped_frames * channels_count / elapsed)
+    return results
+
+
+def bench_dwells(channel_counts: List[int], dwell_durations: List[float], sample_rate: float = 100e3,
+                 reading_rate: float = 10., dwells_count: int = 3) -> Dict[str, Dict[str, List[float]]]:
+    """
+    the whole path of a dwell: the simulated ADC streaming at `sample_rate` frames per second, the filter,
+    `ADCAcquisition`, the record made of the dwell, and its packing; by metric, by channel count, by dwell duration
+    """
+    results: Dict[str, Dict[str, List[float]]] = {
+        'samples per CPU second': {},
+        'CPU time per dwell': {},
+        'record and pack per dwell': {},
+        'memory growth per dwell': {},
+        'reading interval std': {},
+        'reading latency max': {},
+    }
+    tracemalloc.start()
+    channels_count: int
+    for channels_count in channel_counts:
+        row: str = f'{channels_count} channels'
+        metric: str
+        for metric in results:
+            results[metric][row] = []
+        duration: float
+        for duration in dwell_durations:
+            completed: Event = Event()
+
+            def measurement_completed() -> None:
+                acquisition.set_running(False)
+                completed.set()
+
+            acquisition: ADCAcquisition = ADCAcquisition(range(channels_count), measurement_completed, 'simulator',
+                                                         sample_rate=sample_rate, reading_rate=reading_rate)
+            acquisition.start()
+            cpu_times: List[float] = []
+            pack_times: List[float] = []
+            memory: List[int] = []
+            interval_std: List[float] = []
+            latency_max: List[float] = []
+            for _ in range(dwells_count):
+                completed.clear()
+                cpu_time: float = time.process_time()
+                acquisition.measure(0., duration)
+                completed.wait(duration + 5.)
+                cpu_times.append(time.process_time() - cpu_time)
+                start_time: float = time.perf_counter()
+                # as `main.App.set_point` and `main.App.pack_data` do
+                gzip.compress(json.dumps({'raw_data': [dwell_record(acquisition)]}, indent=4).encode())
+                pack_times.append(time.perf_counter() - start_time)
+                acquisition.samples.clear()
+                statistics: Dict[str, Dict[str, float]] = acquisition.timing_statistics()
+                interval_std.append(statistics['interval']['std'])
+                latency_max.append(statistics['latency']['max'])
+                gc.collect()
+                memory.append(tracemalloc.get_traced_memory()[0])
+            acquisition.close()
+            acquisition.join()
+            results['samples per CPU second'][row].append(sample_rate * channels_count * duration
+                                                          / float(np.median(cpu_times)))
+            results['CPU time per dwell'][row].append(float(np.median(cpu_times)))
+            results['record and pack per dwell'][row].append(float(np.median(pack_times)))
+            results['memory growth per dwell'][row].append((memory[-1] - memory[0]) / max(1, dwells_count - 1))
+            results['reading interval std'][row].append(float(np.nanmax(interval_std)))
+            results['reading latency max'][row].append(float(np.nanmax(latency_max)))
+    tracemalloc.stop()
+    return results
+
+
+def bench_station(operations_count: int = 20, angle: float = 3.6, **faults: float) -> Dict[str, List[float]]:
+    """
+    the serial drivers against the simulated devices with the given faults: the motor moving by `angle`
+    and stopping, the Arduino reading a voltage, and the weather station reading its current data;
+    by metric, by device
+    """
+    import smsd
+    from dallas import Dallas  # it needs `crcmod`
+    from running_stats import TimingStatistics
+    from simulators import Station, redirect_comports
+    from temperature_backend import Dallas18B20
+
+    results: Dict[str, List[float]] = {
+        'operations per second': [],
+        'latency mean': [],
+        'latency max': [],
+        'port hold mean': [],
+    }
+    with Station(**faults) as station:
+        redirect_comports(station.ports)
+        motor: smsd.Motor = smsd.Motor(station.ports['smsd'], speed=900)
+        motor.start()
+        motor.open().result()
+        arduino: Dallas18B20 = Dallas18B20()
+        weather_station: Dallas = Dallas()
+        weather_station.open_serial()
+
+        angles: Iterator[float] = itertools.cycle((angle, -angle))
+
+        def move() -> None:
+            motor.move(next(angles))
+            motor.wait_until_idle()
+
+        operations: Dict[str, Tuple[Callable[[], object], object]] = {
+            'smsd': (move, motor),
+            'arduino': (lambda: arduino.voltage('A0'), arduino),
+            'davis': (weather_station.get_realtime_data, weather_station),
+        }
+        operation: Callable[[], object]
+        driver: object
+        for operation, driver in operations.values():
+            latency: TimingStatistics = TimingStatistics()
+            start_time: float = time.perf_counter()
+            for _ in range(operations_count):
+                operation_start_time: float = time.perf_counter()
+                operation()
+                latency.add(time.perf_counter() - operation_start_time)
+            results['operations per second'].append(operations_count / (time.perf_counter() - start_time))
+            results['latency mean'].append(latency.mean)
+            results['latency max'].append(latency.maximum)
+            # the benchmark is the only client, so the ports are never contended; the holds are the round trips
+            results['port hold mean'].append(driver.transactions.statistics()['hold']['mean'])
+        motor.close()
+        motor.join()
+        weather_station.close_serial()
+    return results
+
+
+def print_table(title: str, column_name: str, columns: Sequence[Union[int, float, str]],
+                results: Dict[str, List[float]], unit: str = 'µs', scale: float = 1e6) -> None:
+    print(title)
+    print(f'{column_name:>24}' + ''.join(f'{c:>12}' for c in columns))
+    name: str
+    values: List[float]
+    for name, values in results.items():
+        print(f'{name:>24}' + ''.join(f'{v * scale:>10.3f}{unit}' for v in values))
+    print()
+
+
+if __name__ == '__main__':
+    def main() -> None:
+        suites: List[str] = ['append', 'median', 'filters', 'recorder', 'jitter', 'dwells', 'station']
+        ap = argparse.ArgumentParser(description='Acquisition path benchmarks; they need no hardware and no display')
+        ap.add_argument('--dwell-lengths', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                        help='numbers of samples accumulated per dwell')
+        ap.add_argument('--channels', type=int, nargs='+', default=[1, 2, 4],
+                        help='numbers of ADC channels')
+        ap.add_argument('--dwell-durations', type=float, nargs='+', default=[0.5, 2.],
+                        help='dwell durations for the whole path, in seconds')
+        ap.add_argument('--sample-rate', type=float, default=100e3,
+                        help='frames per second of the simulated ADC for the whole path')
+        ap.add_argument('--latency', type=float, default=0.002,
+                        help='the reply delay of the simulated serial devices, in seconds')
+        ap.add_argument('--dropout-rate', type=float, default=0.,
+                        help='the share of the replies the simulated serial devices lose')
+        ap.add_argument('--garbage-rate', type=float, default=0.,
+                        help='the share of the replies of the simulated serial devices after garbage bytes')
+        ap.add_argument('--suites', choices=suites, nargs='+', default=suites, help='what to run')
+        args = ap.parse_args()
+
+        if 'append' in args.suites:
+            print_table('append cost per sample', 'samples per dwell', args.dwell_lengths,
+                        bench_append(args.dwell_lengths))
+        if 'median' in args.suites:
+            print_table('DMA buffer median per tick', 'channels', args.channels,
+                        bench_dma_median(args.channels), unit='ms', scale=1e3)
+        if 'filters' in args.suites:
+            print_table('filtered samples per second per core', 'channels', args.channels,
+                        bench_filters(args.channels), unit='M', scale=1e-6)
+        if 'recorder' in args.suites:
+            print_table('recorded samples per second', 'channels', args.channels,
+                        bench_recorder(args.channels), unit='M', scale=1e-6)
+        if 'jitter' in args.suites:
+            modes: Dict[str, type] = {'thread': ADCAcquisition, 'process': ADCAcquisitionProcess}
+            print_table('reading timing with the GIL busy', 'acquisition in', list(modes),
+                        bench_acquisition_jitter(modes), unit='ms', scale=1e3)
+        if 'dwells' in args.suites:
+            results: Dict[str, Dict[str, List[float]]] = bench_dwells(args.channels, args.dwell_durations,
+                                                                       sample_rate=args.sample_rate)
+            units: Dict[str, Tuple[str, float]] = {
+                'samples per CPU second': ('M', 1e-6),
+                'CPU time per dwell': ('ms', 1e3),
+                'record and pack per dwell': ('ms', 1e3),
+                'memory growth per dwell': ('kB', 1e-3),
+                'reading interval std': ('ms', 1e3),
+                'reading latency max': ('ms', 1e3),
+            }
+            metric: str
+            for metric, by_channels in results.items():
+                print_table(metric, 'dwell, s', args.dwell_durations, by_channels, *units[metric])
+        if 'station' in args.suites:
+            station_results: Dict[str, List[float]] = bench_station(latency=args.latency,
+                                                                    dropout_rate=args.dropout_rate,
+                                                                    garbage_rate=args.garbage_rate, baud_rate=9600)
+            devices: List[str] = ['smsd', 'arduino', 'davis']
+            print_table('serial operations per second', 'device', devices,
+                        {'operations per second': station_results.pop('operations per second')}, unit='', scale=1.)
+            print_table('serial operation timing', 'device', devices, station_results, unit='ms', scale=1e3)
+
+
+    main()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Final, Optional, Tuple, Union
+
+import numpy as np
+
+__all__ = ['GrowableBuffer', 'RingBuffer']
+
+
+class GrowableBuffer:
+    """ an append-only array with amortized O(1) appending and a zero-copy view of the data """
+
+    GROWTH_FACTOR: Final[float] = 1.5
+    MIN_CAPACITY: Final[int] = 16
+
+    def __init__(self, capacity: int = 1024, dtype: Union[type, np.dtype] = np.float64) -> None:
+        self._data: np.ndarray = np.empty(max(int(capacity), self.MIN_CAPACITY), dtype=dtype)
+        self._size: int = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self.data!r})'
+
+    @property
+    def capacity(self) -> int:
+        return self._data.shape[0]
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._data.dtype
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def data(self) -> np.ndarray:
+        """ the view is invalidated by the next reallocation, so don't keep it for long """
+        return self._data[:self._size]
+
+    def _reserve(self, size: int) -> None:
+        if size <= self.capacity:
+            return
+        new_capacity: int = self.capacity
+        while new_capacity < size:
+            new_capacity = int(new_capacity * self.GROWTH_FACTOR) + 1
+        new_data: np.ndarray = np.empty((new_capacity,) + self._data.shape[1:], dtype=self._data.dtype)
+        new_data[:self._size] = self._data[:self._size]
+        self._data = new_data
+
+    def append(self, value: Any) -> None:
+        self._reserve(self._size + 1)
+        self._data[self._size] = value
+        self._size += 1
+
+    def extend(self, values: Any) -> None:
+        values = np.asarray(values, dtype=self._data.dtype)
+        count: int = values.shape[0] if values.ndim else 1
+        self._reserve(self._size + count)
+        self._data[self._size:self._size + count] = values
+        self._size += count
+
+    def clear(self, shrink_to: Optional[int] = None) -> None:
+        """ forget the data; keep the memory unless asked to shrink it """
+        self._size = 0
+        if shrink_to is not None and self.capacity > max(int(shrink_to), self.MIN_CAPACITY):
+            self._data = np.empty(max(int(shrink_to), self.MIN_CAPACITY), dtype=self._data.dtype)
+
+    def tolist(self) -> list:
+        return self.data.tolist()
+
+
+class RingBuffer:
+    """ the last `capacity` items of a stream in a preallocated array, appended a block at a time """
+
+    def __init__(self, capacity: int, dtype: Union[type, np.dtype] = np.float64, shape: Tuple[int, ...] = ()) -> None:
+        """ `shape` is the shape of an item, e.g., `(channels_count,)` for frames """
+        if capacity <= 0:
+            raise ValueError(f'Invalid capacity: {capacity}')
+        self._data: np.ndarray = np.empty((int(capacity),) + tuple(shape), dtype=dtype)
+        self._position: int = 0  # where the next item goes
+        self._size: int = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self.latest()!r})'
+
+    @property
+    def capacity(self) -> int:
+        return self._data.shape[0]
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._data.dtype
+
+    def append(self, value: Any) -> None:
+        self._data[self._position] = value
+        self._position = (self._position + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def extend(self, values: Any) -> None:
+        values = np.asarray(values, dtype=self._data.dtype)
+        count: int = values.shape[0]
+        if count >= self.capacity:
+            self._data[:] = values[count - self.capacity:]
+            self._position = 0
+            self._size = self.capacity
+            return
+        stop: int = self._position + count
+        if stop <= self.capacity:
+            self._data[self._position:stop] = values
+        else:
+            self._data[self._position:] = values[:self.capacity - self._position]
+            self._data[:stop - self.capacity] = values[self.capacity - self._position:]
+        self._position = stop % self.capacity
+        self._size = min(self._size + count, self.capacity)
+
+    def latest(self, count: Optional[int] = None) -> np.ndarray:
+        """ a copy of the last `count` items, or of all of them, the oldest first """
+        if count is None or count > self._size:
+            count = self._size
+        start: int = self._position - count
+        if start >= 0:
+            return self._data[start:self._position].copy()
+        return np.concatenate((self._data[start:], self._data[:self._position]))
+
+    def clear(self) -> None:
+        self._position = 0
+        self._size = 0
+
+    def tolist(self) -> list:
+        return self.latest().tolist()
@@ -12,6 +12,8 @@ from crcmod.predefined import PredefinedCrc
 from serial.tools.list_ports_common import ListPortInfo
 from serial.tools.list_ports_linux import SysFS
 
+from serial_transaction import TransactionLock
+
 EXCLUDED_WEATHER_FIELDS: List[str] = [
     'PacketType',  # 4 Always zero for current firmware release
     'NextRec',  # 5 loc in archive memory for next data packet
@@ -460,10 +462,9 @@ class Dallas:
 
     def __init__(self) -> None:
         self._ser: serial.Serial = serial.Serial()
-        self._communicating: bool = False
+        self.transactions: TransactionLock = TransactionLock(timeout=3.)
 
     def open_serial(self) -> None:
-        self._communicating = False
         ports: Union[List[ListPortInfo], List[SysFS]] = serial.tools.list_ports.comports()
         port: Union[ListPortInfo, SysFS]
         for port in ports:
@@ -483,7 +484,6 @@ class Dallas:
                     print('SerialException:', ex.strerror)
                 else:
                     print(self._ser.port, "opened for the Davis Instruments Data Logger")
-                    self._communicating = False
                     break
         if not self._ser.is_open:
             time.sleep(1)
@@ -492,36 +492,29 @@ class Dallas:
         print('closing', self._ser.port)
         self._ser.close()
 
-    def _block(self, timeout: float = 3.) -> bool:
-        i: int = 0
-        dt: float = 0.1
-        while self._communicating:
-            time.sleep(dt)
-            i += 1
-            if dt * i > timeout:
-                return False
-        return True
-
     def read_text(self, cmd: str) -> Optional[str]:
-        if not self._block():
+        if not self.transactions.acquire():
             print('controller is very busy to respond to', cmd)
             return None
+        try:
+            return self._read_text(cmd)
+        finally:
+            self.transactions.release()
+
+    def _read_text(self, cmd: str) -> Optional[str]:
         # print('command:', cmd)
         if not self._ser.is_open:
             self.open_serial()
         while self._ser.is_open:
             msg: str = cmd + '\n'
             try:
-                self._communicating = True
                 self._ser.write(msg)
                 # print('written', msg.encode('ascii'))
                 self._ser.flush()
                 # print('reading...')
                 resp: List[str] = [_l.decode().strip() for _l in self._ser.readlines()]
                 self._ser.flush()
-                self._communicating = False
             except (serial.SerialException, TypeError):
-                self._communicating = False
                 continue
             if len(resp) == 0:
                 self.close_serial()
@@ -535,9 +528,15 @@ class Dallas:
         return None
 
     def read_bytes(self, cmd: str, length: Optional[int] = None) -> bytes:
-        if not self._block():
+        if not self.transactions.acquire():
             print('controller is very busy to respond to', cmd)
             return b''
+        try:
+            return self._read_bytes(cmd, length)
+        finally:
+            self.transactions.release()
+
+    def _read_bytes(self, cmd: str, length: Optional[int] = None) -> bytes:
         # print('command:', cmd)
         resp: bytes = b''
         if not self._ser.is_open:
@@ -546,7 +545,6 @@ class Dallas:
             msg: str = cmd + '\n'
             resp = b''
             try:
-                self._communicating = True
                 self._ser.write(msg.encode('ascii'))
                 self._ser.flush()
                 if length is None:
@@ -559,9 +557,7 @@ class Dallas:
                 else:
                     resp = self._ser.read(size=length)
                 self._ser.flush()
-                self._communicating = False
             except (serial.SerialException, TypeError):
-                self._communicating = False
                 continue
             # print('read', resp)
             if len(resp) == 0:
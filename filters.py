@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Dict, Final, Tuple, Type
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+__all__ = ['Decimator', 'BlockMean', 'BlockMedian', 'SigmaClippedMean', 'FIRDecimator', 'CICDecimator',
+           'FILTERS', 'make_decimator']
+
+
+class Decimator:
+    """
+    turn a stream of frames × channels taken at `input_rate` into about `output_rate` frames × channels per second;
+    the blocks may be of any length, the frames that are not enough for an output yet wait for the next block
+    """
+
+    def __init__(self, input_rate: float, output_rate: float) -> None:
+        if input_rate <= 0.:
+            raise ValueError(f'Invalid input rate: {input_rate}')
+        if not 0. < output_rate <= input_rate:
+            raise ValueError(f'Invalid output rate: {output_rate}')
+        self.input_rate: float = float(input_rate)
+        self.factor: int = max(1, round(input_rate / output_rate))
+        self._tail: np.ndarray = np.empty((0, 0))
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}(input_rate={self.input_rate}, output_rate={self.output_rate})'
+
+    @property
+    def output_rate(self) -> float:
+        """ the actual output rate: the input rate divided by a whole number """
+        return self.input_rate / self.factor
+
+    @property
+    def window(self) -> int:
+        """ how many input frames make an output one """
+        return self.factor
+
+    def reset(self) -> None:
+        self._tail = np.empty((0, 0))
+
+    def _reduce(self, windows: np.ndarray) -> np.ndarray:
+        """ outputs × channels × window → outputs × channels """
+        raise NotImplementedError
+
+    def process(self, block: np.ndarray, timestamp: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        filter the next frames; `timestamp` is the time of the last one;
+        return the outputs and the times of the last frames that went into each of them
+        """
+        data: np.ndarray = block
+        if self._tail.shape[1:] == block.shape[1:]:
+            data = np.concatenate((self._tail, block))
+        outputs_count: int = (data.shape[0] - self.window) // self.factor + 1 if data.shape[0] >= self.window else 0
+        if not outputs_count:
+            self._tail = data
+            return np.empty((0,) + block.shape[1:]), np.empty(0)
+        windows: np.ndarray = sliding_window_view(data, self.window, axis=0)[:outputs_count * self.factor:self.factor]
+        self._tail = data[outputs_count * self.factor:]
+        # how many frames have come after the last one of every output
+        lags: np.ndarray = data.shape[0] - self.window - np.arange(outputs_count) * self.factor
+        return self._reduce(windows), timestamp - lags / self.input_rate
+
+    def reduce(self, frames: np.ndarray) -> np.ndarray:
+        """ one value per channel from all the frames, taken in no particular order, like from a circular buffer """
+        return self._reduce(np.asarray(frames, dtype=np.float64).T[np.newaxis])[0]
+
+
+class BlockMean(Decimator):
+    def _reduce(self, windows: np.ndarray) -> np.ndarray:
+        return np.mean(windows, axis=-1)
+
+
+class BlockMedian(Decimator):
+    def _reduce(self, windows: np.ndarray) -> np.ndarray:
+        return np.median(windows, axis=-1)
+
+
+class SigmaClippedMean(Decimator):
+    """ the mean of the frames within `sigma` standard deviations from the center, the outliers being dropped """
+
+    def __init__(self, input_rate: float, output_rate: float, *, sigma: float = 3., iterations: int = 2) -> None:
+        super().__init__(input_rate, output_rate)
+        if sigma <= 0.:
+            raise ValueError(f'Invalid sigma: {sigma}')
+        self.sigma: float = float(sigma)
+        self.iterations: int = max(1, int(iterations))
+
+    def _reduce(self, windows: np.ndarray) -> np.ndarray:
+        windows = np.asarray(windows, dtype=np.float64)
+        center: np.ndarray = np.median(windows, axis=-1, keepdims=True)
+        spread: np.ndarray = np.std(windows, axis=-1, keepdims=True)
+        kept: np.ndarray = np.ones(windows.shape, dtype=bool)
+        for _ in range(self.iterations):
+            kept = np.abs(windows - center) <= self.sigma * spread
+            count: np.ndarray = np.count_nonzero(kept, axis=-1, keepdims=True)
+            # should a tiny sigma have dropped all the frames of a window, its center stays where it was
+            center = np.where(count > 0,
+                              np.sum(windows, axis=-1, keepdims=True, where=kept) / np.maximum(count, 1),
+                              center)
+            spread = np.sqrt(np.sum(np.square(windows - center), axis=-1, keepdims=True, where=kept)
+                             / np.maximum(count, 1))
+        return center[..., 0]
+
+
+class FIRDecimator(Decimator):
+    """ a windowed-sinc low-pass filter cutting off at the output Nyquist frequency, evaluated at the outputs only """
+
+    def __init__(self, input_rate: float, output_rate: float, *, taps_per_factor: int = 4) -> None:
+        super().__init__(input_rate, output_rate)
+        length: int = max(1, int(taps_per_factor)) * self.factor + 1
+        n: np.ndarray = np.arange(length) - (length - 1) / 2
+        taps: np.ndarray = np.sinc(n / self.factor) * np.hamming(length) if length > 1 else np.ones(1)
+        self.taps: np.ndarray = taps / np.sum(taps)
+
+    @property
+    def window(self) -> int:
+        return self.taps.shape[0]
+
+    def _reduce(self, windows: np.ndarray) -> np.ndarray:
+        # the taps are symmetric, so there is no need to flip them
+        return windows @ self.taps
+
+    def reduce(self, frames: np.ndarray) -> np.ndarray:
+        # the order of the frames is unknown, so the best one can do is the DC component
+        return np.mean(frames, axis=0)
+
+
+class CICDecimator(FIRDecimator):
+    """ a cascade of `order` moving averages over `factor` frames: the sinc^order response, with no ripple """
+
+    def __init__(self, input_rate: float, output_rate: float, *, order: int = 3) -> None:
+        Decimator.__init__(self, input_rate, output_rate)
+        if order < 1:
+            raise ValueError(f'Invalid CIC order: {order}')
+        self.order: int = int(order)
+        taps: np.ndarray = np.ones(1)
+        for _ in range(self.order):
+            taps = np.convolve(taps, np.ones(self.factor))
+        self.taps = taps / np.sum(taps)
+
+
+FILTERS: Final[Dict[str, Type[Decimator]]] = {
+    'mean': BlockMean,
+    'median': BlockMedian,
+    'sigma-clipped mean': SigmaClippedMean,
+    'fir': FIRDecimator,
+    'cic': CICDecimator,
+}
+
+
+def make_decimator(name: str, input_rate: float, output_rate: float, **options: Any) -> Decimator:
+    if name.casefold() not in FILTERS:
+        raise ValueError(f'Unknown filter: {name}; possible values are {", ".join(FILTERS)}')
+    return FILTERS[name.casefold()](input_rate, output_rate, **options)
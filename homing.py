@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+from math import ceil, floor
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
+
+from running_stats import TimingStatistics
+
+__all__ = ['Homing', 'HomingResult']
+
+
+class HomingResult(NamedTuple):
+    found: bool  # whether the sensor has shown the zero, not just the controller home switch
+    voltage: Optional[int]  # the sensor reading at home
+    duration: float  # seconds, the turn back included
+    moves: int
+    reads: int
+
+
+class Homing:
+    """
+    the search of the zero angle of `smsd.Motor` by a sensor that reads `threshold` or more from the zero on:
+    turn back by the count, sweep across the threshold reading the sensor all the way, then bisect the microsteps
+    around where it has been crossed, and come to the first microstep at the threshold going forward;
+    if the sensor doesn't cross the threshold within `search_span` degrees, home by the controller and search again;
+    if the sensor can't be read, home by the controller only
+    """
+
+    # how long to wait before reading the sensor again when it has not responded
+    SENSOR_RETRY_PERIOD: float = 0.1
+
+    def __init__(self, motor: Any, read_sensor: Callable[[], Optional[int]], *, threshold: int = 768,
+                 search_span: float = 3.6) -> None:
+        self.motor: Any = motor
+        self._read_sensor: Callable[[], Optional[int]] = read_sensor
+        self.threshold: int = threshold
+        self.search_span: float = search_span
+        self.durations: TimingStatistics = TimingStatistics()  # of the whole homing
+        self.search_durations: TimingStatistics = TimingStatistics()  # of the homing after the turn back
+        self.failures: int = 0
+        self._position: int = 0  # microsteps from where the turn back has ended
+        self._moves: int = 0
+        self._reads: int = 0
+        self._voltage: Optional[int] = None
+
+    def _read(self) -> Optional[bool]:
+        """ whether the sensor reads the threshold or more, None if it can't be read """
+        self._reads += 1
+        self._voltage = self._read_sensor()
+        return None if self._voltage is None else self._voltage >= self.threshold
+
+    def _go(self, position: int) -> None:
+        if position != self._position:
+            self._moves += 1
+            self.motor.move((position - self._position) * self.motor.step)
+            self.motor.wait_until_idle()
+            self._position = position
+
+    def _sweep(self, steps: int) -> List[Tuple[float, bool]]:
+        """ move by `steps` microsteps, reading the sensor all the way; the readings come with their positions """
+        start: int = self._position
+        self._moves += 1
+        self.motor.move(steps * self.motor.step).result()
+        start_time: float = time.perf_counter()
+        rate: float = self.motor.speed() / self.motor.step  # microsteps per second
+        samples: List[Tuple[float, bool]] = []
+        while not self.motor.idle:
+            request_time: float = time.perf_counter()
+            above: Optional[bool] = self._read()
+            if above is None:
+                time.sleep(self.SENSOR_RETRY_PERIOD)
+                continue
+            # the sensor has been read somewhere between the request and the reply
+            travel: float = min(abs(steps), rate * (0.5 * (request_time + time.perf_counter()) - start_time))
+            samples.append((start + (travel if steps > 0 else -travel), above))
+        self._position = start + steps
+        if not samples:
+            raise RuntimeError('the sensor has not been read during the sweep')
+        return samples
+
+    def _narrow(self, low: int, high: int, samples: List[Tuple[float, bool]]) -> Tuple[int, int]:
+        """ the positions around the crossing that the sweep readings show, checked, within `low` and `high` """
+        below_positions: List[float] = [position for position, above in samples if not above]
+        above_positions: List[float] = [position for position, above in samples if above]
+        if not below_positions or not above_positions:
+            return low, high
+        # where the motor has been between two readings is uncertain
+        margin: int = 1 + ceil(abs(samples[-1][0] - samples[0][0]) / max(1, len(samples) - 1))
+        narrow_low: int = max(low, floor(max(below_positions)) - margin)
+        narrow_high: int = min(high, ceil(min(above_positions)) + margin)
+        if narrow_low >= narrow_high:
+            return low, high
+        # check the nearer end first, for the motor has to come there anyway
+        ends: List[int] = sorted([narrow_low, narrow_high], key=lambda p: abs(p - self._position))
+        end: int
+        for end in ends:
+            if end in (low, high):
+                continue
+            self._go(end)
+            if self._read() == (end == narrow_high):
+                if end == narrow_low:
+                    low = narrow_low
+                else:
+                    high = narrow_high
+        return low, high
+
+    def _find_edge(self) -> bool:
+        above: Optional[bool] = self._read()
+        if above is None:
+            raise RuntimeError('no “0” position data')
+        span: int = max(1, self.motor.degrees_to_steps(self.search_span))
+        # back when the sensor is past the zero, forward when it's before it
+        samples: List[Tuple[float, bool]] = self._sweep(-span if above else span)
+        end_above: Optional[bool] = self._read()
+        if end_above is None or end_above == above:
+            print(f'A0 voltage has not crossed {self.threshold} within {self.search_span}°: it is', self._voltage)
+            return False
+        low: int
+        high: int
+        low, high = (self._position, self._position + span) if above else (self._position - span, self._position)
+        low, high = self._narrow(low, high, samples)
+        while high - low > 1:
+            middle: int = (low + high) // 2
+            self._go(middle)
+            middle_above: Optional[bool] = self._read()
+            if middle_above is None:
+                raise RuntimeError('the sensor has stopped responding')
+            if middle_above:
+                high = middle
+            else:
+                low = middle
+        # come forward to the zero as the controller does
+        self._go(low)
+        self._go(high)
+        self._read()
+        return True
+
+    def _search(self) -> Optional[bool]:
+        """ whether the zero has been found by the sensor, None if the sensor can't be read """
+        try:
+            return self._find_edge()
+        except RuntimeError as ex:
+            print('homing by the sensor stopped:', ex, file=sys.stderr)
+            return None
+
+    def home(self, current_angle: float) -> HomingResult:
+        """ find the zero from `current_angle` degrees counted since the last homing """
+        start_time: float = time.perf_counter()
+        self._moves = 1
+        self._reads = 0
+        self.motor.move(-current_angle)
+        self.motor.wait_until_idle()
+        search_start_time: float = time.perf_counter()
+        self._position = 0
+        found: Optional[bool] = self._search()
+        if not found:
+            print('making whole turn')
+            self._moves += 1
+            self.motor.forward()
+            self.motor.move_home()
+            self.motor.wait_until_idle()
+            self._position = 0
+            if found is not None:
+                found = self._search()
+        found = bool(found)
+        if not found:
+            self.failures += 1
+        now: float = time.perf_counter()
+        self.durations.add(now - start_time)
+        self.search_durations.add(now - search_start_time)
+        print(f'homing took {now - start_time:.1f} s, {self._moves} moves, and {self._reads} sensor readings; '
+              f'{self.durations.mean:.1f} ± {self.durations.std:.1f} s on average over {self.durations.count} times')
+        return HomingResult(found=found, voltage=self._voltage, duration=now - start_time,
+                            moves=self._moves, reads=self._reads)
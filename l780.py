@@ -9,7 +9,9 @@ from ctypes.util import find_library
 from pathlib import Path
 from typing import Iterable
 
-from adc import ADC
+import numpy as np
+
+from adc import ADC, as_frames
 
 __all__ = ['L780']
 lib_l780: CDLL = CDLL(find_library('l780') or './lib''l780.so')
@@ -285,8 +287,7 @@ class L780(ADC):
     def __init__(self, channels: Iterable[int], *, timeout: float = 0.1):
         super().__init__(channels)
         self.timeout: float = timeout
-        if max(self.channels) > 7:
-            raise ValueError(f'There is no channel {max(self.channels)}')
+        self._check_channels(self.channels)
 
         error: int
         self._board: _L780 = _L780()
@@ -314,11 +315,6 @@ class L780(ADC):
         self._adc_par.SyncType = 0
         self._adc_par.SyncSrc = 0
 
-        self._adc_par.NumberOfChannels = 2 * len(self.channels)
-        index: int
-        for index in range(self._adc_par.NumberOfChannels):
-            self._adc_par.Chn[index] = index
-
         self._adc_par.FIFO = 1024
 
         self._adc_par.IrqStep = 1024
@@ -326,6 +322,22 @@ class L780(ADC):
         self._adc_par.IrqEna = 1
         self._adc_par.AdcEna = True
 
+        self._data_p = None
+        self._buffer_size: int = 0
+        self._frames: np.ndarray = np.empty((0, len(self.channels)))
+        # till then, the buffer holds the samples taken before the last reprogramming
+        self._fresh_data_time: float = 0.
+        self._program_adc()
+
+    def _program_adc(self) -> None:
+        """ set the channels up and start the ADC; the firmware and the stream buffer stay as they are """
+        error: int
+
+        self._adc_par.NumberOfChannels = 2 * len(self.channels)
+        index: int
+        for index in range(self._adc_par.NumberOfChannels):
+            self._adc_par.Chn[index] = index
+
         error = self._board.fill_adc_parameters(self._adc_par)
         if error:
             raise RuntimeError(f'fillADCParameters failed with code {error}')
@@ -340,7 +352,19 @@ class L780(ADC):
         self._board.start()
         print('device started')
 
-        self._buffer_size: int = self._board.get_io_buffer_size(stream_id=_L780.STREAM_ADC)
+        self._buffer_size = self._board.get_io_buffer_size(stream_id=_L780.STREAM_ADC)
+        # every other channel is skipped, see `NumberOfChannels` above
+        self._frames = as_frames(self._data_p, self._buffer_size, self._adc_par.NumberOfChannels)[:, ::2]
+        self._fresh_data_time = time.perf_counter() + self._buffer_size / (1000. * self._adc_par.dRate)
+
+    @property
+    def frame_rate(self) -> float:
+        # `dRate` is in kHz, `dFrame` is in ms; every other channel is skipped, see `NumberOfChannels` above
+        return 1000. / (self._adc_par.NumberOfChannels / self._adc_par.dRate + self._adc_par.dFrame)
+
+    def _apply_channels(self) -> None:
+        self._board.stop()
+        self._program_adc()
 
     def __del__(self) -> None:
         self._board.stop()
@@ -352,19 +376,10 @@ class L780(ADC):
         self._is_running = True
         try:
             while self._is_running:
-                for index, channel in enumerate(self.channels):
-                    raw_data: list[int] \
-                        = typing.cast(list, self._data_p[index * 2:self._buffer_size:self._adc_par.NumberOfChannels])
-                    raw_data.sort()
-                    count: int = len(raw_data)
-                    s: float
-                    if count & 1:
-                        s = float(raw_data[count // 2])
-                    else:
-                        s = 0.5 * raw_data[count // 2] + 0.5 * raw_data[count // 2 - 1]
-                    s *= 10. / (1 << 14)
-                    self.voltages[index] = s
-                time.sleep(self.timeout)
+                with self._configuration_lock:
+                    if time.perf_counter() >= self._fresh_data_time:
+                        self.publish((self.reduce_frames(self._frames) * (10. / (1 << 14))).tolist())
+                time.sleep(self.reading_period)
         except (KeyboardInterrupt, SystemExit):
             return
         finally:
@@ -8,7 +8,9 @@ from ctypes import *
 from ctypes.util import find_library
 from typing import Iterable
 
-from adc import ADC
+import numpy as np
+
+from adc import ADC, as_frames
 
 __all__ = ['L791']
 lib_l791: CDLL = CDLL(find_library('l791') or './lib''l791.so')
@@ -173,6 +175,11 @@ class _L791:
     STREAM_ADC: int = 1
     STREAM_DAC: int = 2
 
+    # indices in the register buffer, see `791cmd.h`
+    REG_BUFFER_LENGTH: int = 0x1000 >> 2
+    I_ADC_PCI_COUNT: int = 0xF80 >> 2  # samples transferred into the IO buffer, wraps at 2³²
+    I_FIRMWARE_VERSION: int = 0xFF4 >> 2
+
     def __init__(self, slot: int = 0) -> None:
         create_instance = lib_l791.createInstance
         create_instance.restype = _L791.PCL791
@@ -239,11 +246,15 @@ class _L791:
 
 
 class L791(ADC):
-    def __init__(self, channels: Iterable[int], *, timeout: float = 0.1):
+    SCALE: float = 10. / (1 << 14)  # V per ADC unit
+
+    def __init__(self, channels: Iterable[int], *, timeout: float = 0.1, streaming: bool = False):
         super().__init__(channels)
         self.timeout: float = timeout
-        if max(self.channels) > 7:
-            raise ValueError(f'There is no channel {max(self.channels)}')
+        # in the streaming mode, every sample goes to `block_consumers` once, and the readings are filtered blocks
+        self.streaming: bool = streaming
+        self.lost_samples: int = 0
+        self._check_channels(self.channels)
 
         error: int
         self._board: _L791 = _L791()
@@ -265,11 +276,6 @@ class L791(ADC):
         self._adc_par.SyncType = 0
         self._adc_par.SyncSrc = 0
 
-        self._adc_par.NumberOfChannels = 2 * len(self.channels)
-        index: int
-        for index in range(self._adc_par.NumberOfChannels):
-            self._adc_par.Chn[index] = index
-
         self._adc_par.FIFO = 1024
 
         self._adc_par.IrqStep = 1024
@@ -277,6 +283,30 @@ class L791(ADC):
         self._adc_par.IrqEna = 3  # no interruptions
         self._adc_par.AdcEna = True
 
+        self._data_p = None
+        self._buffer_size: int = 0
+        self._ring: np.ndarray = np.empty(0, dtype=np.uint16)
+        self._frames: np.ndarray = np.empty((0, len(self.channels)))
+        self._block_size: int = 0
+        # till then, the buffer holds the samples taken before the last reprogramming
+        self._fresh_data_time: float = 0.
+        # the streaming loop has to find its place in the buffer anew
+        self._stream_restarted: bool = True
+        self._program_adc()
+
+        sync_p = self._board.get_reg_buffer_pointer()
+        self._sync: np.ndarray = np.ctypeslib.as_array(sync_p, shape=(_L791.REG_BUFFER_LENGTH,))
+        print(f'Current Firmware Version: {hex(int(self._sync[_L791.I_FIRMWARE_VERSION]))}')
+
+    def _program_adc(self) -> None:
+        """ set the channels up and start the ADC; the stream buffer stays as it is """
+        error: int
+
+        self._adc_par.NumberOfChannels = 2 * len(self.channels)
+        index: int
+        for index in range(self._adc_par.NumberOfChannels):
+            self._adc_par.Chn[index] = index
+
         error = self._board.fill_adc_parameters(self._adc_par)
         if error:
             raise RuntimeError(f'fillADCParameters failed with code {error}')
@@ -285,15 +315,29 @@ class L791(ADC):
         if error:
             raise RuntimeError(f'setStreamParameters failed with code {error}')
         self._data_p = self._board.get_io_buffer_pointer(stream_id=_L791.STREAM_ADC)
-        sync_p = self._board.get_reg_buffer_pointer()
-        print(f'Current Firmware Version: {hex(typing.cast(int, sync_p[1021]))}')
 
         self._board.init_start()
         print('init device started')
         self._board.start()
         print('device started')
 
-        self._buffer_size: int = self._board.get_io_buffer_size(stream_id=_L791.STREAM_ADC)
+        self._buffer_size = self._board.get_io_buffer_size(stream_id=_L791.STREAM_ADC)
+        self._ring = np.ctypeslib.as_array(self._data_p, shape=(self._buffer_size,))
+        # every other channel is skipped, see `NumberOfChannels` above
+        self._frames = as_frames(self._data_p, self._buffer_size, self._adc_par.NumberOfChannels)[:, ::2]
+        # the streaming mode reads the buffer by halves, in whole frames
+        self._block_size = self._buffer_size // 2 // self._adc_par.NumberOfChannels * self._adc_par.NumberOfChannels
+        self._fresh_data_time = time.perf_counter() + self._buffer_size / (1000. * self._adc_par.dRate)
+        self._stream_restarted = True
+
+    @property
+    def frame_rate(self) -> float:
+        # `dRate` is in kHz, `dFrame` is in ms; every other channel is skipped, see `NumberOfChannels` above
+        return 1000. / (self._adc_par.NumberOfChannels / self._adc_par.dRate + self._adc_par.dFrame)
+
+    def _apply_channels(self) -> None:
+        self._board.stop()
+        self._program_adc()
 
     def __del__(self) -> None:
         self._board.stop()
@@ -301,23 +345,64 @@ class L791(ADC):
         self._board.close()
         print('device closed')
 
+    @property
+    def block_duration(self) -> float:
+        """ the time to fill half of the IO buffer, in seconds """
+        return self._block_size / (1000. * self._adc_par.dRate)
+
+    def _adc_count(self) -> int:
+        return int(self._sync[_L791.I_ADC_PCI_COUNT])
+
+    def _read_block(self, position: int) -> np.ndarray:
+        start: int = position % self._buffer_size
+        stop: int = start + self._block_size
+        raw: np.ndarray
+        if stop <= self._buffer_size:
+            raw = self._ring[start:stop]
+        else:
+            raw = np.concatenate((self._ring[start:], self._ring[:stop - self._buffer_size]))
+        # every other channel is skipped, see `NumberOfChannels` above
+        return raw.reshape(-1, self._adc_par.NumberOfChannels)[:, ::2].astype(np.float32) * np.float32(self.SCALE)
+
+    def _stream(self) -> None:
+        """ follow the hardware write counter and consume every new half of the circular buffer exactly once """
+        hardware_count: int = 0
+        position: int = 0
+        while self._is_running:
+            with self._configuration_lock:
+                if self._stream_restarted:
+                    self._stream_restarted = False
+                    hardware_count = self._adc_count()
+                    # the count started at a frame boundary, so round it up to the next one
+                    position = hardware_count + (-hardware_count) % self._adc_par.NumberOfChannels
+                now: float = time.perf_counter()
+                # unwrap the 32-bit counter
+                hardware_count += (self._adc_count() - hardware_count) & 0xFFFFFFFF
+                available: int = hardware_count - position
+                if available > self._buffer_size - self._block_size:
+                    # the board has overwritten what has not been read yet: skip to the freshest complete block
+                    skipped: int = (available - self._block_size) // self._block_size * self._block_size
+                    self.lost_samples += skipped
+                    position += skipped
+                    available -= skipped
+                while available >= self._block_size:
+                    block: np.ndarray = self._read_block(position)
+                    position += self._block_size
+                    available -= self._block_size
+                    # time the last frame of the block by the hardware count, not by when the loop got to it
+                    self.publish_frames(block, now - (available // self._adc_par.NumberOfChannels) / self.frame_rate)
+            time.sleep(min(self.timeout, 0.25 * self.block_duration))
+
     def run(self):
         self._is_running = True
         try:
+            if self.streaming:
+                self._stream()
             while self._is_running:
-                for index, channel in enumerate(self.channels):
-                    raw_data: list[int] \
-                        = typing.cast(list, self._data_p[index * 2:self._buffer_size:self._adc_par.NumberOfChannels])
-                    raw_data.sort()
-                    count: int = len(raw_data)
-                    s: float
-                    if count & 1:
-                        s = float(raw_data[count // 2])
-                    else:
-                        s = 0.5 * raw_data[count // 2] + 0.5 * raw_data[count // 2 - 1]
-                    s *= 10. / (1 << 14)
-                    self.voltages[index] = s
-                time.sleep(self.timeout)
+                with self._configuration_lock:
+                    if time.perf_counter() >= self._fresh_data_time:
+                        self.publish((self.reduce_frames(self._frames) * self.SCALE).tolist())
+                time.sleep(self.reading_period)
         except (KeyboardInterrupt, SystemExit):
             return
         finally:
@@ -13,7 +13,7 @@ import sys
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type, Union
 
 import matplotlib.style
 import numpy as np
@@ -27,16 +27,30 @@ from matplotlib.dates import date2num
 from matplotlib.legend import Legend
 from matplotlib.lines import Line2D
 
-from backend import ADCAcquisition
+import adc
+from backend import ADCAcquisition, ADCAcquisitionProcess, dwell_record
 from dallas import Dallas
 from gui import GUI
+from homing import Homing
+from route_planner import RoutePlan, Stop, next_in_sweep, plan_route, sweep, sweep_direction
+from sweep import SweepOrigin, sweep_records
 from temperature_backend import Dallas18B20
 from utils import label_lines, make_desktop_launcher, stringify_list, to_bool
 
-try:
-    import smsd_dummy as smsd
-except ImportError:
+# `kind=device` pairs of the simulated serial devices, see `simulators.ports`; the simulators need a POSIX system
+SIMULATED_PORTS: Dict[str, str] = {}
+if os.environ.get('CRIMEA_SERIAL_PORTS'):
+    from simulators import ports_from_environment, redirect_comports
+
+    SIMULATED_PORTS = ports_from_environment()
+    redirect_comports(SIMULATED_PORTS)
+if SIMULATED_PORTS:
     import smsd
+else:
+    try:
+        import smsd_dummy as smsd
+    except ImportError:
+        import smsd
 from smsd import MicrosteppingMode
 
 matplotlib.style.use('fast')
@@ -61,6 +75,9 @@ class App(GUI):
 
         # current schedule table row being measured
         self._current_row: Optional[int] = None
+        # whether the current sweep goes by ascending angle, and how many scans the motor has made since homing
+        self._sweep_ascending: bool = True
+        self._scans_since_home: int = 0
         self._init_angle: float = 0.0
         #
         self.last_loop_data = {}
@@ -197,7 +214,7 @@ class App(GUI):
 
         self._measured: bool = False
 
-        self.motor = smsd.Motor(device='/dev/ttyS0',
+        self.motor = smsd.Motor(device=SIMULATED_PORTS.get('smsd', '/dev/ttyS0'),
                                 microstepping_mode=MicrosteppingMode(index=self.spin_step_fraction.value()),
                                 speed=self.spin_settings_speed.value(),
                                 ratio=self.spin_settings_gear_1.value() / self.spin_settings_gear_2.value())
@@ -211,12 +228,52 @@ class App(GUI):
 
         self.arduino: Dallas18B20 = Dallas18B20()
         self.arduino.start()
+        self.homing: Homing = Homing(self.motor, lambda: self.arduino.voltage('A0'))
 
         self.output_folder: str = self.get_config_value('settings', 'output folder',
                                                         os.path.join(os.path.curdir, 'data'), str)
         self.data: List[dict] = []
 
-        self.adc_thread: ADCAcquisition = ADCAcquisition(self.adc_channels, self.set_point)
+        adc_backend: str = adc.backend_name(self.get_config_value('adc', 'backend', '', str))
+        adc_options: Dict[str, Any] = {}
+        if adc_backend == 'simulator':
+            adc_options = {
+                'sample_rate': self.get_config_value('simulator', 'sample rate', 10_000., float),
+                'reading_rate': self.get_config_value('simulator', 'reading rate', 10., float),
+                'noise': self.get_config_value('simulator', 'noise', 0.01, float),
+                'overrange_rate': self.get_config_value('simulator', 'overrange rate', 0., float),
+                'overrange_duration': self.get_config_value('simulator', 'overrange duration', 0.01, float),
+                'black_body_angle': self.get_config_value('settings', 'black body position', 0., float),
+            }
+        acquisition_class: Type[Union[ADCAcquisition, ADCAcquisitionProcess]] = ADCAcquisition
+        if self.get_config_value('adc', 'separate process', False, bool):
+            acquisition_class = ADCAcquisitionProcess
+        recording: Optional[Dict[str, Any]] = None
+        if self.get_config_value('recorder', 'folder', '', str):
+            recording = {'folder': self.get_config_value('recorder', 'folder', '', str)}
+            if self.get_config_value('recorder', 'filter', '', str):
+                recording['filter_name'] = self.get_config_value('recorder', 'filter', '', str)
+                recording['output_rate'] = self.get_config_value('recorder', 'filter rate', 10., float)
+        self.adc_thread: Union[ADCAcquisition, ADCAcquisitionProcess] = \
+            acquisition_class(self.adc_channels, self.set_point, adc_backend,
+                              shared_memory=self.get_config_value('adc', 'shared memory', '', str),
+                              recording=recording, **adc_options)
+        # take a fixed number of readings per dwell, however long the driver takes to yield them
+        self._counted_dwells: bool = self.get_config_value('adc', 'counted dwells', False, bool)
+        # 'table' visits the enabled rows in the table order, 'sweep' goes by angle, back and forth,
+        # 'continuous' turns back and forth across the angles of the rows without stopping, measuring all the way
+        self._route: str = self.get_config_value('schedule', 'route', 'table', str)
+        # the width of the angle bins of the continuous scans, in degrees
+        self._angle_bin_width: float = self.get_config_value('schedule', 'angle bin width', 1., float)
+        # where and when the last continuous scan has started
+        self._sweep_origin: Optional[SweepOrigin] = None
+        self._home_every: int = max(1, self.get_config_value('schedule', 'home every', 1, int))
+        adc_filter: str = self.get_config_value('adc', 'filter', '', str)
+        if adc_filter:
+            try:
+                self.adc_thread.set_filter(adc_filter, self.get_config_value('adc', 'filter rate', 10., float))
+            except ValueError as ex:
+                print(ex, '; the readings are the medians', sep='')
         self.adc_thread.start()
         self.load_config_2()
 
@@ -281,6 +338,7 @@ class App(GUI):
                 self.adc_thread.close()
                 self.adc_thread.join()
                 self.motor.disable()
+                self.motor.close()
                 self.motor.join()
                 self.arduino.stop()
                 # FIXME: the following line causes double channel count changes
@@ -737,6 +795,52 @@ class App(GUI):
                     return r
             return rows[0]
 
+    def route_stops(self) -> List[Stop]:
+        return [Stop(row=r, angle=self.table_schedule.cellWidget(r, 1).value(),
+                     duration=self.table_schedule.cellWidget(r, 2).value())
+                for r in self.enabled_rows()]
+
+    def next_route_row(self, new_scan: bool = False) -> Tuple[Optional[int], bool]:
+        """ the next row to measure at and whether it begins a new scan """
+        if self._route != 'sweep':
+            next_row: Optional[int] = self.next_enabled_row(-1 if new_scan or self._current_row is None
+                                                            else self._current_row)
+            return next_row, next_row is not None and (new_scan or self._current_row is None
+                                                       or next_row <= self._current_row)
+        stops: List[Stop] = self.route_stops()
+        if not stops:
+            return None, False
+        if not new_scan and self._current_row is not None:
+            current: Stop = Stop(row=self._current_row,
+                                 angle=self.table_schedule.cellWidget(self._current_row, 1).value(),
+                                 duration=self.table_schedule.cellWidget(self._current_row, 2).value())
+            following: Optional[Stop] = next_in_sweep(stops, current, self._sweep_ascending)
+            if following is not None:
+                return following.row, False
+        self._sweep_ascending = sweep_direction(stops, self._current_angle)
+        return sweep(stops, self._sweep_ascending)[0].row, True
+
+    def plan_route(self) -> RoutePlan:
+        """ the scans from homing to homing, and how long they take """
+        stops: List[Stop] = self.route_stops()
+        if self._route == 'continuous':
+            # only the ends of a continuous scan matter
+            stops = [Stop(row=-1, angle=min(s.angle for s in stops), duration=0.),
+                     Stop(row=-1, angle=max(s.angle for s in stops), duration=0.)] if stops else []
+            return plan_route(stops, self.motor.time_to_turn, scans_count=self._home_every,
+                              homing_time=self.time_to_find_home())
+        return plan_route(stops, self.motor.time_to_turn, scans_count=self._home_every,
+                          settle_time=self._measurement_delay, homing_time=self.time_to_find_home(),
+                          optimize=self._route == 'sweep')
+
+    def report_route_plan(self) -> None:
+        plan: RoutePlan = self.plan_route()
+        if not plan.scans:
+            return
+        print(f'predicted cycle time is {plan.cycle_time:.1f} s: {len(plan.scans)} scans of '
+              f'{plan.rotation_time / len(plan.scans):.1f} s of turning and '
+              f'{plan.dwell_time / len(plan.scans):.1f} s of dwelling each, and {plan.homing_time:.1f} s of homing')
+
     def fill_weather(self, weather: dict) -> None:
         if weather:
             if weather.get('OutsideTemp', None) is not None:
@@ -909,42 +1013,35 @@ class App(GUI):
         self.update_temperature_values()
         if self._measured or ignore_home:
             self.canvas.draw_idle()
+            if self._route == 'continuous':
+                self.measure_next_sweep(ignore_home)
+                return
             current_angle = self.table_schedule.cellWidget(self._current_row, 1).value()
             self.last_loop_data[current_angle] = self.last_voltages()
-            next_row = self.next_enabled_row(self._current_row)
+            next_row, new_scan = self.next_route_row(new_scan=ignore_home)
             if next_row is None:
                 return
 
-            if self._current_row >= next_row and not ignore_home:
+            if new_scan and not ignore_home:
                 self.add_τs()
+                self._scans_since_home += 1
 
-                self.pd.setMaximum(round(1000 * self.time_to_move_home()))
-                self.pd.setLabelText('Wait till the motor comes home')
-                self.pd.reset()
-                self.move_home()
-                if self.timer.receivers(self.timer.timeout):
-                    self.timer.timeout.disconnect()
-                self.timer.timeout.connect(
-                    lambda: self.next_pd_tick(
-                        fallback=lambda: self.measure_next(ignore_home=True),
-                        abort=self.adc_thread.done
-                    )
-                )
-                self.timer.setSingleShot(True)
-                self.timer.start(100)  # don't use QTimer.singleShot here to be able to stop the timer later!!
-
+            if new_scan and not ignore_home and self._scans_since_home >= self._home_every:
+                self._scans_since_home = 0
+                self.home_between_scans()
                 self.pack_data()
                 # self.adc_thread.purge_obsolete_data(purge_all=True)
 
             elif self.button_go.isChecked():
+                if new_scan and not ignore_home:
+                    self.pack_data()
                 angle = self.table_schedule.cellWidget(next_row, 1).value()
                 duration = self.table_schedule.cellWidget(next_row, 2).value()
                 self._current_row = next_row
                 self.highlight_current_row()
 
                 self.motor.move(angle - self._current_angle)
-                self.adc_thread.measure(self.motor.time_to_turn(angle - self._current_angle) + self._measurement_delay,
-                                        duration)
+                self.adc_thread.targets.append((self._measure_when_settled, (duration, angle)))
                 self._measured = False
                 self._current_angle = angle
                 self.set_config_value('common', 'last angle', angle)
@@ -954,7 +1051,8 @@ class App(GUI):
                 self.timer.timeout.connect(self.measure_next)
                 self.timer.setSingleShot(True)
                 # don't use QTimer.singleShot here to be able to stop the timer later!!
-                self.timer.start(round(1000 * self.measurement_time(angle, duration)))
+                # the dwell can't be over sooner; when the motor is slower, `measure_next` checks again
+                self.timer.start(round(1000 * (self._measurement_delay + duration)))
         else:
             if self.timer.receivers(self.timer.timeout):
                 self.timer.timeout.disconnect()
@@ -962,18 +1060,77 @@ class App(GUI):
             self.timer.setSingleShot(True)
             self.timer.start(100)  # don't use QTimer.singleShot here to be able to stop the timer later!!
 
+    def home_between_scans(self) -> None:
+        """ send the motor home and go on measuring when it's there """
+        self.pd.setMaximum(round(1000 * self.time_to_move_home()))
+        self.pd.setLabelText('Wait till the motor comes home')
+        self.pd.reset()
+        self.move_home()
+        if self.timer.receivers(self.timer.timeout):
+            self.timer.timeout.disconnect()
+        self.timer.timeout.connect(
+            lambda: self.next_pd_tick(
+                fallback=lambda: self.measure_next(ignore_home=True),
+                abort=self.adc_thread.done
+            )
+        )
+        self.timer.setSingleShot(True)
+        self.timer.start(100)  # don't use QTimer.singleShot here to be able to stop the timer later!!
+
+    def measure_next_sweep(self, ignore_home: bool = False) -> None:
+        if not ignore_home:
+            self.add_τs()
+            self._scans_since_home += 1
+            if self._scans_since_home >= self._home_every:
+                self._scans_since_home = 0
+                self.home_between_scans()
+                self.pack_data()
+                return
+            self.pack_data()
+        if self.button_go.isChecked():
+            self.start_sweep()
+
+    def start_sweep(self) -> None:
+        """ turn across the angles of the enabled rows from the nearer end to the farther one, measuring all the way """
+        stops: List[Stop] = self.route_stops()
+        if not stops:
+            return
+        start_angle: float = min(s.angle for s in stops)
+        end_angle: float = max(s.angle for s in stops)
+        if not sweep_direction(stops, self._current_angle):
+            start_angle, end_angle = end_angle, start_angle
+
+        self.motor.move(start_angle - self._current_angle)
+        self.adc_thread.targets.append((self._sweep_when_settled, (start_angle, end_angle)))
+        self._measured = False
+        self._current_angle = end_angle
+        self.set_config_value('common', 'last angle', end_angle)
+
+        if self.timer.receivers(self.timer.timeout):
+            self.timer.timeout.disconnect()
+        self.timer.timeout.connect(self.measure_next)
+        self.timer.setSingleShot(True)
+        # don't use QTimer.singleShot here to be able to stop the timer later!!
+        self.timer.start(round(1000 * (self.motor.time_to_turn(end_angle - start_angle) or 0.)))
+
     def button_go_toggled(self, new_value: bool) -> None:
-        if new_value and self.table_schedule.rowCount() > 0:
+        if new_value and self.table_schedule.rowCount() > 0 and self._route == 'continuous':
+            self.report_route_plan()
+            self.purge_obsolete_data(purge_all=True)
+            self.start_sweep()
+        elif new_value and self.table_schedule.rowCount() > 0:
+            if self._current_row is None:
+                self._current_row, _ = self.next_route_row(new_scan=True)
             if self._current_row is None:
-                self._current_row = self.next_enabled_row(-1)
+                return
+            self.report_route_plan()
             self.highlight_current_row()
             angle = self.table_schedule.cellWidget(self._current_row, 1).value()
             duration = self.table_schedule.cellWidget(self._current_row, 2).value()
             self.purge_obsolete_data(purge_all=True)
 
             self.motor.move(angle - self._current_angle)
-            self.adc_thread.measure(self.motor.time_to_turn(angle - self._current_angle) + self._measurement_delay,
-                                    duration)
+            self.adc_thread.targets.append((self._measure_when_settled, (duration, angle)))
             self._measured = False
             self._current_angle = angle
             self.set_config_value('common', 'last angle', angle)
@@ -983,7 +1140,7 @@ class App(GUI):
             self.timer.timeout.connect(self.measure_next)
             self.timer.setSingleShot(True)
             # don't use QTimer.singleShot here to be able to stop the timer later!!
-            self.timer.start(round(self.measurement_time(angle, duration)) * 1000)
+            self.timer.start(round(1000 * (self._measurement_delay + duration)))
         else:
             self.timer.stop()
             self.adc_thread.set_running(False)
@@ -1297,102 +1454,20 @@ class App(GUI):
         self._current_angle -= 360
         return self.motor.time_to_turn(360)
 
-    def time_to_move_home(self) -> Optional[float]:
-        return (self.motor.time_to_turn(self._current_angle)
-                + self.motor.time_to_turn(360)
+    def time_to_find_home(self) -> Optional[float]:
+        """ how long `_move_home` takes once it has turned back to the zero angle """
+        if self.homing.search_durations.count > 1:
+            return self.homing.search_durations.mean + self.homing.search_durations.std
+        return (self.motor.time_to_turn(360)
                 + 4. * self.motor.microstepping_mode * self.motor.time_to_turn(self.motor.step)
                 + 4. * self.motor.microstepping_mode
                 + 2. * self.motor.time_to_turn(25.2))
 
+    def time_to_move_home(self) -> Optional[float]:
+        return self.motor.time_to_turn(self._current_angle) + self.time_to_find_home()
+
     def _move_home(self) -> None:
-        _threshold: int = 768
-        self.motor.move(-self._current_angle)
-        time.sleep(self.motor.time_to_turn(self._current_angle))
-        v: Optional[int] = self.arduino.voltage('A0')
-        print('A0 voltage is', v)
-        if v is None:
-            print('no “0” position data', file=sys.stderr)
-            print('making whole turn')
-            self.motor.forward()
-            self.motor.move_home()
-            time.sleep(self.motor.time_to_turn(360))
-        else:
-            _i: int = 0
-            if v is not None and v > _threshold:
-                print('making steps back to ensure the motor is not behind “0”')
-            while v is not None and v > _threshold and _i < self.motor.microstepping_mode:
-                print(f'attempt #{_i + 1} out of {self.motor.microstepping_mode} to find “0”')
-                self.motor.move(-self.motor.step)
-                time.sleep(self.motor.time_to_turn(self.motor.step))
-                v = self.arduino.voltage('A0')
-                if v is None or v > _threshold:
-                    print('it failed: A0 voltage still is', v)
-                else:
-                    print('success: A0 voltage is', v)
-                _i += 1
-            if v is not None and v < _threshold:
-                print('making steps forward to get back to “0”')
-                self.motor.move(self.motor.step)
-                time.sleep(self.motor.time_to_turn(self.motor.step))
-                v = self.arduino.voltage('A0')
-                print('A0 voltage is', v)
-                _i = 0
-            while v is not None and v < _threshold and _i < self.motor.microstepping_mode:
-                print(f'attempt #{_i + 1} out of {self.motor.microstepping_mode} to find “0”')
-                self.motor.move(self.motor.step)
-                time.sleep(self.motor.time_to_turn(self.motor.step))
-                v = self.arduino.voltage('A0')
-                if v is None or v < _threshold:
-                    print('it failed: A0 voltage is', v)
-                else:
-                    print('success: A0 voltage is', v)
-                _i += 1
-            if v is None or v < _threshold:
-                print('making whole turn')
-                self.motor.forward()
-                self.motor.move_home()
-                time.sleep(self.motor.time_to_turn(360.0))
-        print('moving back and forth')
-        self.motor.move(-25.2)
-        time.sleep(self.motor.time_to_turn(25.2))
-        self.motor.forward()
-        self.motor.move_home()
-        time.sleep(self.motor.time_to_turn(25.2))
-        v = self.arduino.voltage('A0')
-        print('A0 voltage is', v)
-        if v is None:
-            print('no “0” position data', file=sys.stderr)
-        else:
-            _i: int = 0
-            if v is not None and v > _threshold:
-                print('making steps back to ensure the motor is not behind “0”')
-            while v is not None and v > _threshold and _i < self.motor.microstepping_mode:
-                print(f'attempt #{_i + 1} out of {self.motor.microstepping_mode} to find “0”')
-                self.motor.move(-self.motor.step)
-                time.sleep(self.motor.time_to_turn(self.motor.step))
-                v = self.arduino.voltage('A0')
-                if v is None or v > _threshold:
-                    print('it failed: A0 voltage still is', v)
-                else:
-                    print('success: A0 voltage is', v)
-                _i += 1
-            if v is not None and v < _threshold:
-                print('making steps forward to get back to “0”')
-                self.motor.move(self.motor.step)
-                time.sleep(self.motor.time_to_turn(self.motor.step))
-                v = self.arduino.voltage('A0')
-                print('A0 voltage is', v)
-                _i = 0
-            while v is not None and v < _threshold and _i < self.motor.microstepping_mode:
-                print(f'attempt #{_i + 1} out of {self.motor.microstepping_mode} to find “0”')
-                self.motor.move(self.motor.step)
-                time.sleep(self.motor.time_to_turn(self.motor.step))
-                v = self.arduino.voltage('A0')
-                if v is None or v < _threshold:
-                    print('it failed: A0 voltage is', v)
-                else:
-                    print('success: A0 voltage is', v)
-                _i += 1
+        v: Optional[int] = self.homing.home(self._current_angle).voltage
         with open('A0_voltage.csv', 'a') as f_out:
             f_out.write(f'{v}\n')
         self._current_angle = 0.0
@@ -1409,12 +1484,42 @@ class App(GUI):
             raise ValueError('Measurement delay can not be negative')
         self._measurement_delay = _delay
 
-    def measurement_time(self, angle, duration) -> float:
-        """ convenience function """
-        if self.motor.speed():
-            return self.motor.time_to_turn(angle - self._current_angle) + self._measurement_delay + duration
-        else:
-            return np.nan
+    def _sweep_when_settled(self, start_angle: float, end_angle: float) -> None:
+        """ once the motor is at `start_angle`, turn to `end_angle` measuring all the way """
+        self.motor.wait_until_idle()
+        # the turn starts when the controller accepts it
+        self.motor.move(end_angle - start_angle).result()
+        self._sweep_origin = SweepOrigin(time=time.time(), angle=start_angle, end_angle=end_angle,
+                                         rate=np.copysign(self.motor.speed(), end_angle - start_angle))
+        self.adc_thread.measure(0., self.motor.time_to_turn(end_angle - start_angle) or 0., sweep=self._sweep_origin)
+
+    def _measure_when_settled(self, duration: float, angle: float) -> None:
+        """ start the dwell `_measurement_delay` seconds after the motor stops, not after it should have """
+        self.motor.wait_until_idle()
+        self.adc_thread.measure(self._measurement_delay, duration, angle, self._counted_dwells)
+
+    def plot_voltages(self, x: datetime, voltage_statistics: Dict[str, Any]) -> None:
+        """ add the mean voltages of a dwell or an angle bin to the plot """
+        self.voltage_x = np.concatenate((self.voltage_x, np.array([date2num(x)])))
+        for ch, (count, mean) in enumerate(zip(voltage_statistics['count'], voltage_statistics['mean'])):
+            if count:
+                if len(self.voltage_y) > ch:
+                    self.voltage_y[ch] = np.concatenate((self.voltage_y[ch], np.array([mean])))
+                else:
+                    self.voltage_y.append(np.full(self.voltage_y[-1].shape, np.nan))
+                if self.voltage_x.shape != self.voltage_y[ch].shape:
+                    print('data shapes do not match:', file=sys.stderr)
+                    print('channel', ch, file=sys.stderr)
+                    print(self.voltage_x, file=sys.stderr)
+                    print(self.voltage_y[ch], file=sys.stderr)
+                else:
+                    self._plot_lines[ch].set_data(self.voltage_x, self.voltage_y[ch])
+            else:
+                print('empty y for channel', ch + 1, file=sys.stderr)
+                self.voltage_y[ch] = np.concatenate((self.voltage_y[ch], np.array([np.nan])))
+        for ch in range(len(voltage_statistics['count']), len(self.voltage_y)):
+            # deactivated channels after the count changed ↑
+            self.voltage_y[ch] = np.concatenate((self.voltage_y[ch], np.array([np.nan])))
 
     def set_point(self) -> None:
         self.purge_obsolete_data()
@@ -1438,34 +1543,22 @@ class App(GUI):
         data_item['setpoints'] = self.arduino.setpoints
         data_item['states'] = self.arduino.states
         data_item['enabled'] = self.arduino.enabled
-        data_item['timestamp'] = self.adc_thread.current_x.timestamp()
-        data_item['time'] = self.adc_thread.current_x.isoformat()
-        data_item['angle'] = self._current_angle
-        # noinspection PyTypeChecker
-        data_item['voltage'] = [ys.tolist() for ys in self.adc_thread.current_y]
-        self.data.append(data_item)
-
-        self.voltage_x = np.concatenate((self.voltage_x, np.array([date2num(self.adc_thread.current_x)])))
-        for ch, ys in enumerate(self.adc_thread.current_y):
-            if ys.size:
-                if len(self.voltage_y) > ch:
-                    self.voltage_y[ch] = np.concatenate((self.voltage_y[ch], np.array([np.mean(ys)])))
-                else:
-                    self.voltage_y.append(np.full(self.voltage_y[-1].shape, np.nan))
-                if self.voltage_x.shape != self.voltage_y[ch].shape:
-                    print('data shapes do not match:', file=sys.stderr)
-                    print('channel', ch, file=sys.stderr)
-                    print(self.voltage_x, file=sys.stderr)
-                    print(self.voltage_y[ch], file=sys.stderr)
-                else:
-                    self._plot_lines[ch].set_data(self.voltage_x, self.voltage_y[ch])
-            else:
-                print('empty y for channel', ch + 1, file=sys.stderr)
-                self.voltage_y[ch] = np.concatenate((self.voltage_y[ch], np.array([np.nan])))
-            self.adc_thread.current_y[ch] = np.array([])
-        for ch in range(len(self.adc_thread.current_y), len(self.voltage_y)):
-            # deactivated channels after the count changed ↑
-            self.voltage_y[ch] = np.concatenate((self.voltage_y[ch], np.array([np.nan])))
+        if self._sweep_origin is not None:
+            record: Dict[str, Any]
+            for record in sweep_records(self.adc_thread.samples.data, self._sweep_origin, self._angle_bin_width):
+                self.data.append({**data_item, **record,
+                                  'time': datetime.fromtimestamp(record['timestamp']).isoformat(),
+                                  'acquisition timing': self.adc_thread.timing_statistics()})
+                self.last_loop_data[record['angle']] = record['voltage statistics']['mean']
+                self.plot_voltages(datetime.fromtimestamp(record['timestamp']), record['voltage statistics'])
+            self._sweep_origin = None
+        else:
+            data_item['timestamp'] = self.adc_thread.current_x.timestamp()
+            data_item['time'] = self.adc_thread.current_x.isoformat()
+            data_item['angle'] = self._current_angle
+            data_item.update(dwell_record(self.adc_thread))
+            self.data.append(data_item)
+            self.plot_voltages(self.adc_thread.current_x, data_item['voltage statistics'])
 
         self.plot.relim(visible_only=True)
         self.plot.autoscale_view(None, self.plot.get_autoscalex_on(), self.plot.get_autoscaley_on())
@@ -1475,6 +1568,7 @@ class App(GUI):
         # rotate and align the tick labels so they look better
         self.figure.autofmt_xdate(bottom=self.subplotpars['bottom'])
         self.figure.canvas.draw_idle()
+        self.adc_thread.samples.clear()
         self.adc_thread.set_running(False)
         self._measured = True
 
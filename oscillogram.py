@@ -1,38 +1,212 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
-import time
-from typing import List
-
-try:
-    import radiometer_dummy as radiometer
-except ImportError:
-    import radiometer
-
-ADC_CHANNELS: List[int] = [0]
-EPS: float = 0.01
-N_BEFORE: int = 10000
-N_AFTER: int = 10000
-
-adc = radiometer.L791(channels=ADC_CHANNELS, timeout=0.01)
-adc.start()
-
-data: List[List[float]] = [[]] * len(ADC_CHANNELS)
-
-signal_registered: bool = False
-wait_for_signal: bool = True
-
-while wait_for_signal:
-    for channel, voltage in enumerate(adc.voltages):
-        if not signal_registered and len(data[channel]) > N_BEFORE:
-            data[channel].pop(0)
-        if len(data[channel]) < N_BEFORE + N_AFTER:
-            data[channel].append(voltage)
-        if not signal_registered and abs(data[channel][-1] - data[channel][0]) > EPS:
-            signal_registered = True
-        elif signal_registered and all(abs(data[ch][-1] - data[ch][-2]) < EPS for ch in range(len(data))):
-            wait_for_signal = False
-
-    time.sleep(2. * adc.timeout)
-
-with open('log.csv', 'w') as f_out:
-    f_out.write('\n'.join(','.join(repr(data[ch][i]) for ch in range(len(data))) for i in range(len(data[0]))))
+
+from math import nan
+from pathlib import Path
+from threading import Condition
+from typing import Any, Dict, Final, List, NamedTuple, Optional, Union
+
+import numpy as np
+
+from buffers import RingBuffer
+
+__all__ = ['Trigger', 'Capture', 'TriggeredCapture', 'save_capture', 'NATIVE_BLOCK_OPTIONS']
+
+# the options of the ADC drivers that make them deliver every frame at their own rate rather than a value per tick
+NATIVE_BLOCK_OPTIONS: Final[Dict[str, Dict[str, Any]]] = {
+    'ads1256': {'continuous': True},
+    'l791': {'streaming': True},
+}
+
+
+class Trigger:
+    """
+    where a block of frames × channels fires, looking at the `channel` column or at any of them if it's None:
+    'threshold' fires when the voltage crosses `level`, 'slope' fires when it changes by `level` volts in a frame;
+    `edge` is 'rising', 'falling', or 'either'
+    """
+
+    KINDS: Final[List[str]] = ['threshold', 'slope']
+    EDGES: Final[List[str]] = ['rising', 'falling', 'either']
+
+    def __init__(self, kind: str = 'threshold', level: float = 0., edge: str = 'rising',
+                 channel: Optional[int] = None) -> None:
+        if kind not in self.KINDS:
+            raise ValueError(f'Unknown trigger: {kind}; possible values are {", ".join(self.KINDS)}')
+        if edge not in self.EDGES:
+            raise ValueError(f'Unknown edge: {edge}; possible values are {", ".join(self.EDGES)}')
+        if kind == 'slope' and level <= 0.:
+            raise ValueError(f'Invalid slope: {level}')
+        self.kind: str = kind
+        self.level: float = float(level)
+        self.edge: str = edge
+        self.channel: Optional[int] = channel
+        self._previous_frame: Optional[np.ndarray] = None
+
+    def __repr__(self) -> str:
+        return (f'{self.__class__.__name__}(kind={self.kind!r}, level={self.level}, edge={self.edge!r}, '
+                f'channel={self.channel})')
+
+    def reset(self) -> None:
+        """ forget the last frame, for the next block is not contiguous with it """
+        self._previous_frame = None
+
+    def find(self, block: np.ndarray) -> Optional[int]:
+        """ the index of the first frame of the block that fires, if any; the blocks are to come in order """
+        if not block.shape[0]:
+            return None
+        values: np.ndarray = block if self.channel is None else block[:, [self.channel]]
+        previous: np.ndarray = np.concatenate((values[:1] if self._previous_frame is None else self._previous_frame,
+                                               values[:-1]))
+        self._previous_frame = values[-1:].copy()
+        rising: np.ndarray
+        falling: np.ndarray
+        if self.kind == 'threshold':
+            rising = (previous < self.level) & (values >= self.level)
+            falling = (previous > self.level) & (values <= self.level)
+        else:
+            rising = values - previous >= self.level
+            falling = previous - values >= self.level
+        fired: np.ndarray = {'rising': rising, 'falling': falling, 'either': rising | falling}[self.edge].any(axis=1)
+        if not fired.any():
+            return None
+        return int(np.argmax(fired))
+
+
+class Capture(NamedTuple):
+    frames: np.ndarray  # frames × channels in volts
+    trigger_index: int  # the frame that fired; there may be fewer frames before it than asked for
+    trigger_time: float  # `time.perf_counter()` of that frame
+    frame_rate: float  # frames per second, NaN if unknown
+
+
+class TriggeredCapture:
+    """
+    a block consumer of `adc.ADC` that keeps the last `pre_frames` frames in a ring buffer and,
+    when the trigger fires, takes the `post_frames` frames that follow, the one that fired included
+    """
+
+    def __init__(self, channels_count: int, trigger: Trigger, *, pre_frames: int = 10_000, post_frames: int = 10_000,
+                 frame_rate: float = nan) -> None:
+        if pre_frames < 0 or post_frames <= 0:
+            raise ValueError(f'Invalid capture length: {pre_frames} + {post_frames}')
+        self.trigger: Trigger = trigger
+        self.frame_rate: float = float(frame_rate)
+        self._history: RingBuffer = RingBuffer(max(1, pre_frames), dtype=np.float32, shape=(channels_count,))
+        self._pre_frames: int = pre_frames
+        self._frames: np.ndarray = np.empty((pre_frames + post_frames, channels_count), dtype=np.float32)
+        self._start: int = 0  # where the captured frames begin in `_frames`, for the history may have been short
+        self._stop: int = 0  # where the next captured frame goes, or 0 while waiting for the trigger
+        self._trigger_time: float = nan
+        self._captures: List[Capture] = []
+        self._captured: Condition = Condition()
+        self.armed: bool = True
+
+    def arm(self) -> None:
+        """ wait for the trigger again """
+        with self._captured:
+            self._stop = 0
+            self._history.clear()
+            self.trigger.reset()
+            self.armed = True
+
+    def __call__(self, block: np.ndarray, timestamp: float) -> None:
+        # `arm` resets the history and the capture from another thread
+        with self._captured:
+            self._take(block, timestamp)
+
+    def _take(self, block: np.ndarray, timestamp: float) -> None:
+        if not self.armed:
+            return
+        if not self._stop:
+            index: Optional[int] = self.trigger.find(block)
+            if index is None:
+                self._history.extend(block)
+                return
+            self._history.extend(block[:index])
+            history: np.ndarray = self._history.latest(self._pre_frames)
+            self._start = self._pre_frames - history.shape[0]
+            self._frames[self._start:self._pre_frames] = history
+            self._stop = self._pre_frames
+            self._trigger_time = timestamp - (block.shape[0] - 1 - index) / self.frame_rate
+            block = block[index:]
+        count: int = min(block.shape[0], self._frames.shape[0] - self._stop)
+        self._frames[self._stop:self._stop + count] = block[:count]
+        self._stop += count
+        if self._stop == self._frames.shape[0]:
+            self.armed = False
+            self._captures.append(Capture(frames=self._frames[self._start:].copy(),
+                                          trigger_index=self._pre_frames - self._start,
+                                          trigger_time=self._trigger_time,
+                                          frame_rate=self.frame_rate))
+            self._captured.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[Capture]:
+        """ the oldest capture not taken yet, waiting for one if there is none """
+        with self._captured:
+            if not self._captures:
+                self._captured.wait(timeout)
+            return self._captures.pop(0) if self._captures else None
+
+
+def save_capture(capture: Capture, path: Union[str, Path]) -> None:
+    """ write the capture as CSV if the file name ends with '.csv', or as a NumPy '.npz' archive otherwise """
+    path = Path(path)
+    if path.suffix.casefold() == '.csv':
+        np.savetxt(path, capture.frames, fmt='%.7g', delimiter=',',
+                   header=f'frame rate {capture.frame_rate}, trigger at frame {capture.trigger_index}')
+    else:
+        np.savez(path, frames=capture.frames, trigger_index=capture.trigger_index,
+                 trigger_time=capture.trigger_time, frame_rate=capture.frame_rate)
+
+
+if __name__ == '__main__':
+    def main() -> None:
+        import argparse
+
+        import adc
+
+        ap = argparse.ArgumentParser(description='Capture the ADC voltages around a trigger')
+        ap.add_argument('--backend', default='', help='the ADC backend, detected if omitted')
+        ap.add_argument('--channels', type=int, nargs='+', default=[0], help='the ADC channels')
+        ap.add_argument('--trigger', choices=Trigger.KINDS, default='threshold')
+        ap.add_argument('--level', type=float, default=0.01, help='the threshold in volts, or the slope in V/frame')
+        ap.add_argument('--edge', choices=Trigger.EDGES, default='either')
+        ap.add_argument('--trigger-channel', type=int, help='the index among the channels, any of them if omitted')
+        ap.add_argument('--pre', type=int, default=10_000, help='frames to keep before the trigger')
+        ap.add_argument('--post', type=int, default=10_000, help='frames to take from the trigger on')
+        ap.add_argument('--count', type=int, default=1, help='how many captures to take')
+        ap.add_argument('--output', default='log.csv', help='the file name, CSV or .npz; numbered if count > 1')
+        args = ap.parse_args()
+
+        backend: str = adc.backend_name(args.backend)
+        device: adc.ADC = adc.device_class(backend)(channels=args.channels, timeout=0.01,
+                                                    **NATIVE_BLOCK_OPTIONS.get(backend, {}))
+        if not device.streaming:
+            print(f'the {backend} driver gives a value per {device.reading_period} s, not its every frame')
+        capture: TriggeredCapture = TriggeredCapture(len(device.channels),
+                                                     Trigger(args.trigger, args.level, args.edge,
+                                                             args.trigger_channel),
+                                                     pre_frames=args.pre, post_frames=args.post,
+                                                     frame_rate=device.block_frame_rate)
+        device.block_consumers.append(capture)
+        device.start()
+        output: Path = Path(args.output)
+        try:
+            number: int
+            for number in range(args.count):
+                result: Optional[Capture] = None
+                while result is None:
+                    result = capture.wait(1.)
+                path: Path = output if args.count == 1 else output.with_name(f'{output.stem}_{number}{output.suffix}')
+                save_capture(result, path)
+                print('captured', result.frames.shape[0], 'frames to', path)
+                capture.arm()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            device.stop()
+            device.join()
+
+
+    main()
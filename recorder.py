@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import time
+from datetime import datetime
+from math import ceil
+from pathlib import Path
+from queue import Full, Queue
+from threading import Thread
+from typing import Any, Dict, Final, List, Optional, Tuple, Union
+
+import numpy as np
+
+import filters
+
+__all__ = ['StreamRecorder']
+
+
+class StreamRecorder(Thread):
+    """
+    write the frames of the ADC into preallocated memory-mapped files, one per hour, with JSON sidecars;
+    `write` is a block consumer of `adc.ADC`, and it never waits: should the disk fall behind, the blocks are dropped
+    and the gaps are noted in the sidecar
+    """
+
+    DTYPE: Final[np.dtype] = np.dtype('<f4')
+    # how many blocks may wait for the disk
+    QUEUE_LENGTH: Final[int] = 256
+    # how often to rewrite the sidecar of the current file, in seconds
+    SIDECAR_PERIOD: Final[float] = 60.
+
+    def __init__(self, folder: Union[str, Path], *, filter_name: Optional[str] = None, output_rate: float = 10.,
+                 **filter_options: Any) -> None:
+        """ with `filter_name` set, the frames are decimated by the filter from `filters.FILTERS` before recording """
+        super().__init__()
+        self.daemon = True
+        self.folder: Path = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self._filter: Optional[Tuple[str, float, Dict[str, Any]]] = None
+        if filter_name:
+            # fail early on a wrong name
+            filters.make_decimator(filter_name, output_rate, output_rate, **filter_options)
+            self._filter = (filter_name, output_rate, filter_options)
+        self._queue: Queue = Queue(maxsize=self.QUEUE_LENGTH)
+        self.dropped_frames: int = 0
+        self._dropped_since_last_block: int = 0
+
+        self._channels: List[int] = []
+        self._sample_rate: float = 0.
+        self._decimator: Optional[filters.Decimator] = None
+
+        self._file_path: Optional[Path] = None
+        self._frames: Optional[np.memmap] = None
+        self._frames_written: int = 0
+        self._hour: Optional[datetime] = None
+        self._sidecar: Dict[str, Any] = {}
+        self._sidecar_time: float = 0.
+
+    def configure(self, channels: List[int], sample_rate: float) -> None:
+        """ the channels and the rate of the blocks to come; a change starts a new file """
+        # unlike a block, it waits for room: without it, all the blocks after it would be dropped as unconfigured
+        self._queue.put(('configure', list(channels), float(sample_rate)))
+
+    def write(self, block: np.ndarray, timestamp: float) -> None:
+        """ queue the frames; `timestamp` is the `time.perf_counter()` of the last one """
+        if self._dropped_since_last_block:
+            if not self._put(('gap', self._dropped_since_last_block)):
+                self.dropped_frames += block.shape[0]
+                self._dropped_since_last_block += block.shape[0]
+                return
+            self._dropped_since_last_block = 0
+        if not self._put(('block', block, timestamp + time.time() - time.perf_counter())):
+            self.dropped_frames += block.shape[0]
+            self._dropped_since_last_block += block.shape[0]
+
+    def stop(self) -> None:
+        self._queue.put(None)
+
+    def _put(self, item: Tuple[Any, ...]) -> bool:
+        try:
+            self._queue.put_nowait(item)
+        except Full:
+            return False
+        return True
+
+    @property
+    def rate(self) -> float:
+        """ the rate of the recorded frames """
+        return self._sample_rate if self._decimator is None else self._decimator.output_rate
+
+    def _open(self, first_frame_time: float) -> None:
+        start: datetime = datetime.fromtimestamp(first_frame_time)
+        self._hour = start.replace(minute=0, second=0, microsecond=0)
+        # till the end of the hour, with some room for the clock drift of the board
+        capacity: int = int(((self._hour.timestamp() + 3600.) - first_frame_time) * self.rate * 1.01) + 1
+        self._file_path = self.folder / f'{start.strftime("%Y%m%d%H%M%S%f")}.raw'
+        size: int = capacity * len(self._channels) * self.DTYPE.itemsize
+        fd: int = os.open(self._file_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if hasattr(os, 'posix_fallocate'):
+                # really allocate the blocks to keep the file contiguous and not to run out of space in the middle
+                os.posix_fallocate(fd, 0, size)
+            else:
+                os.ftruncate(fd, size)
+        finally:
+            os.close(fd)
+        self._frames = np.memmap(self._file_path, dtype=self.DTYPE, mode='r+', shape=(capacity, len(self._channels)))
+        self._frames_written = 0
+        self._sidecar = {
+            'dtype': self.DTYPE.str,
+            'shape': [0, len(self._channels)],
+            'rate': self.rate,
+            'channels': self._channels,
+            'filter': None if self._filter is None else self._filter[0],
+            'start': first_frame_time,
+            'gaps': [],  # [frame index, about how many frames are lost before it]
+        }
+        self._write_sidecar()
+
+    def _write_sidecar(self) -> None:
+        self._sidecar['shape'][0] = self._frames_written
+        sidecar_path: Path = self._file_path.with_suffix('.json')
+        temporary_path: Path = sidecar_path.with_suffix('.json.tmp')
+        temporary_path.write_text(json.dumps(self._sidecar, indent=4))
+        os.replace(temporary_path, sidecar_path)
+        self._sidecar_time = time.monotonic()
+
+    def _close(self) -> None:
+        if self._frames is None:
+            return
+        self._frames.flush()
+        del self._frames
+        self._frames = None
+        # give back the space that has not been used
+        os.truncate(self._file_path, self._frames_written * len(self._channels) * self.DTYPE.itemsize)
+        self._write_sidecar()
+        print('recorded', self._frames_written, 'frames to', self._file_path)
+
+    def _configure(self, channels: List[int], sample_rate: float) -> None:
+        if channels == self._channels and sample_rate == self._sample_rate:
+            return
+        self._close()
+        self._channels = channels
+        self._sample_rate = sample_rate
+        self._decimator = None
+        if self._filter is not None and sample_rate > 0.:
+            name: str
+            output_rate: float
+            options: Dict[str, Any]
+            name, output_rate, options = self._filter
+            self._decimator = filters.make_decimator(name, sample_rate, min(output_rate, sample_rate), **options)
+
+    def _record(self, block: np.ndarray, last_frame_time: float) -> None:
+        if self._decimator is not None:
+            block, times = self._decimator.process(block, last_frame_time)
+            if not block.shape[0]:
+                return
+            last_frame_time = float(times[-1])
+        if not self._channels or block.shape[1] != len(self._channels):
+            return  # taken before the channels changed
+        frames_count: int = block.shape[0]
+        first_frame_time: float = last_frame_time - (frames_count - 1) / self.rate
+        position: int = 0
+        while position < frames_count:
+            frame_time: float = first_frame_time + position / self.rate
+            if (self._frames is None
+                    or frame_time >= self._hour.timestamp() + 3600.
+                    or self._frames_written == self._frames.shape[0]):
+                self._close()
+                self._open(frame_time)
+            frames_till_next_hour: int = max(1, ceil((self._hour.timestamp() + 3600. - frame_time) * self.rate))
+            count: int = min(frames_count - position, self._frames.shape[0] - self._frames_written,
+                             frames_till_next_hour)
+            self._frames[self._frames_written:self._frames_written + count] = block[position:position + count]
+            self._frames_written += count
+            position += count
+        if time.monotonic() - self._sidecar_time > self.SIDECAR_PERIOD:
+            self._write_sidecar()
+
+    def run(self) -> None:
+        try:
+            while True:
+                item: Optional[Tuple[Any, ...]] = self._queue.get()
+                if item is None:
+                    break
+                kind: str = item[0]
+                if kind == 'block':
+                    self._record(*item[1:])
+                elif kind == 'gap':
+                    if self._frames is not None:
+                        self._sidecar['gaps'].append([self._frames_written,
+                                                      item[1] // (1 if self._decimator is None
+                                                                  else self._decimator.factor)])
+                    if self._decimator is not None:
+                        self._decimator.reset()
+                elif kind == 'configure':
+                    self._configure(*item[1:])
+        finally:
+            self._close()
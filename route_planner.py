@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+from math import nan
+from typing import Callable, Iterable, List, NamedTuple, Optional, Sequence
+
+__all__ = ['Stop', 'RoutePlan', 'sweep', 'sweep_direction', 'next_in_sweep', 'plan_route']
+
+# how long the motor takes to turn by an angle in degrees, like `smsd.Motor.time_to_turn`; None if it can't turn
+TurnTime = Callable[[float], Optional[float]]
+
+
+class Stop(NamedTuple):
+    row: int  # in the schedule table
+    angle: float  # degrees from home
+    duration: float  # seconds of the dwell
+
+
+class RoutePlan(NamedTuple):
+    scans: List[List[Stop]]  # the stops in the order of visiting them, scan by scan, from homing to homing
+    rotation_time: float  # seconds of turning from stop to stop
+    dwell_time: float  # seconds of settling and measuring
+    homing_time: float  # seconds of getting home after the last scan
+
+    @property
+    def cycle_time(self) -> float:
+        return self.rotation_time + self.dwell_time + self.homing_time
+
+    @property
+    def scan_time(self) -> float:
+        """ the cycle time per scan, homing included """
+        return self.cycle_time / len(self.scans) if self.scans else nan
+
+
+def _turn_time(time_to_turn: TurnTime, angle: float) -> float:
+    t: Optional[float] = time_to_turn(abs(angle))
+    return nan if t is None else t
+
+
+def sweep(stops: Iterable[Stop], ascending: bool = True) -> List[Stop]:
+    """ the stops by angle, the rows of the same angle in the table order """
+    return sorted(stops, key=lambda s: (s.angle, s.row), reverse=not ascending)
+
+
+def sweep_direction(stops: Sequence[Stop], start_angle: float) -> bool:
+    """
+    whether to sweep the stops by ascending angle when starting at `start_angle`: from the nearer end, the motor
+    crosses the span of the stops once, so that the scans alternate their direction unless the motor goes home
+    """
+    if not stops:
+        return True
+    return abs(start_angle - min(s.angle for s in stops)) <= abs(start_angle - max(s.angle for s in stops))
+
+
+def next_in_sweep(stops: Iterable[Stop], current: Stop, ascending: bool) -> Optional[Stop]:
+    """ the stop to visit after `current` in the sweep, None if the sweep is over """
+    following: List[Stop] = [s for s in stops
+                             if ((s.angle, s.row) > (current.angle, current.row)) == ascending
+                             and (s.angle, s.row) != (current.angle, current.row)]
+    return sweep(following, ascending)[0] if following else None
+
+
+def plan_route(stops: Sequence[Stop], time_to_turn: TurnTime, *, scans_count: int = 1, start_angle: float = 0.,
+               settle_time: float = 0., homing_time: float = 0., optimize: bool = True) -> RoutePlan:
+    """
+    the stops to visit in `scans_count` scans from `start_angle` on, and the time it all takes, going home at last;
+    `settle_time` is the delay before each dwell, `homing_time` is the time of the search of home once there;
+    unless `optimize`, the scans visit the stops in the given order, as the table lists them
+    """
+    if scans_count < 1:
+        raise ValueError(f'Invalid number of scans: {scans_count}')
+    scans: List[List[Stop]] = []
+    rotation_time: float = 0.
+    dwell_time: float = 0.
+    angle: float = start_angle
+    for _ in range(scans_count if stops else 0):
+        scan: List[Stop] = sweep(stops, sweep_direction(stops, angle)) if optimize else list(stops)
+        stop: Stop
+        for stop in scan:
+            rotation_time += _turn_time(time_to_turn, stop.angle - angle)
+            dwell_time += settle_time + stop.duration
+            angle = stop.angle
+        scans.append(scan)
+    return RoutePlan(scans=scans, rotation_time=rotation_time, dwell_time=dwell_time,
+                     homing_time=_turn_time(time_to_turn, angle) + homing_time)
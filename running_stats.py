@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+from math import nan, sqrt
+from typing import Dict, Final, List, Union
+
+import numpy as np
+
+__all__ = ['RunningStatistics', 'TimingStatistics', 'OVERRANGE_LIMIT']
+
+OVERRANGE_LIMIT: Final[float] = 5.0  # V, the full scale: a voltage at it or beyond it is an overrange
+
+
+class RunningStatistics:
+    """
+    the count, mean, variance, minimum, maximum, and overranges of every channel, updated sample by sample
+    by Welford, so that they are ready as soon as the dwell is over; NaN voltages are not counted
+    """
+
+    def __init__(self, channels_count: int, overrange_limit: float = OVERRANGE_LIMIT) -> None:
+        self.overrange_limit: float = float(overrange_limit)
+        self.count: np.ndarray = np.zeros(channels_count, dtype=np.int64)
+        self.mean: np.ndarray = np.full(channels_count, np.nan)
+        self._m2: np.ndarray = np.zeros(channels_count)
+        self.minimum: np.ndarray = np.full(channels_count, np.nan)
+        self.maximum: np.ndarray = np.full(channels_count, np.nan)
+        self.overrange_high: np.ndarray = np.zeros(channels_count, dtype=np.int64)
+        self.overrange_low: np.ndarray = np.zeros(channels_count, dtype=np.int64)
+
+    @property
+    def channels_count(self) -> int:
+        return self.count.shape[0]
+
+    def add(self, voltages: np.ndarray) -> None:
+        """ one sample, a voltage per channel """
+        voltages = np.asarray(voltages, dtype=np.float64)
+        valid: np.ndarray = ~np.isnan(voltages)
+        self.count += valid
+        # the first sample of a channel replaces the NaN mean
+        delta: np.ndarray = voltages - np.where(self.count == 1, voltages, self.mean)
+        self.mean = np.where(valid, np.where(self.count == 1, voltages, self.mean + delta / np.maximum(self.count, 1)),
+                             self.mean)
+        self._m2 = np.where(valid, self._m2 + delta * (voltages - self.mean), self._m2)
+        self.minimum = np.where(valid, np.fmin(self.minimum, voltages), self.minimum)
+        self.maximum = np.where(valid, np.fmax(self.maximum, voltages), self.maximum)
+        self.overrange_high += voltages >= self.overrange_limit
+        self.overrange_low += voltages <= -self.overrange_limit
+
+    @property
+    def variance(self) -> np.ndarray:
+        """ the sample variance, NaN for fewer than two samples """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, self._m2 / (self.count - 1), np.nan)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+    def as_dict(self) -> Dict[str, Union[List[int], List[float], Dict[str, List[int]]]]:
+        """ lists by channel, ready for JSON """
+        return {
+            'count': self.count.tolist(),
+            'mean': self.mean.tolist(),
+            'std': self.std.tolist(),
+            'min': self.minimum.tolist(),
+            'max': self.maximum.tolist(),
+            'overrange': {'limit': self.overrange_limit,
+                          'high': self.overrange_high.tolist(), 'low': self.overrange_low.tolist()},
+        }
+
+
+class TimingStatistics:
+    """ the running mean, standard deviation, and maximum of time intervals, by Welford """
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.mean: float = nan
+        self._m2: float = 0.
+        self.maximum: float = nan
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        if self.count == 1:
+            self.mean = self.maximum = value
+            self._m2 = 0.
+            return
+        delta: float = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.maximum = max(self.maximum, value)
+
+    @property
+    def std(self) -> float:
+        return sqrt(self._m2 / (self.count - 1)) if self.count > 1 else nan
+
+    def as_dict(self) -> Dict[str, float]:
+        return {'count': self.count, 'mean': self.mean, 'std': self.std, 'max': self.maximum}
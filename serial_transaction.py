@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import time
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from running_stats import TimingStatistics
+
+__all__ = ['TransactionLock']
+
+
+class TransactionLock:
+    """
+    one command and its reply at a time on a serial port, whatever thread sends it;
+    counts how often and how long the callers wait for the port and hold it
+    """
+
+    def __init__(self, timeout: float = 3.) -> None:
+        """ `timeout` is how long `acquire` waits for the port by default, in seconds """
+        self.timeout: float = timeout
+        self._lock: Lock = Lock()
+        self._metrics_lock: Lock = Lock()
+        self._acquisition_time: float = 0.
+        self.contended: int = 0  # how many transactions had to wait for another one
+        self.timeouts: int = 0  # how many gave up waiting
+        self._waits: TimingStatistics = TimingStatistics()
+        self._holds: TimingStatistics = TimingStatistics()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """ wait for the port; False if it is still busy after `timeout` seconds or the default timeout """
+        start_time: float = time.perf_counter()
+        acquired: bool = self._lock.acquire(blocking=False)
+        contended: bool = not acquired
+        if not acquired:
+            acquired = self._lock.acquire(timeout=self.timeout if timeout is None else timeout)
+        if not acquired:
+            with self._metrics_lock:
+                self.timeouts += 1
+            return False
+        self._acquisition_time = time.perf_counter()
+        with self._metrics_lock:
+            self._waits.add(self._acquisition_time - start_time)
+            self.contended += contended
+        return True
+
+    def release(self) -> None:
+        with self._metrics_lock:
+            self._holds.add(time.perf_counter() - self._acquisition_time)
+        self._lock.release()
+
+    def __enter__(self) -> 'TransactionLock':
+        if not self.acquire():
+            raise TimeoutError('The port is busy')
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.release()
+
+    def statistics(self) -> Dict[str, Any]:
+        """ the transaction counts and the wait and hold times, in seconds """
+        with self._metrics_lock:
+            return {'contended': self.contended, 'timeouts': self.timeouts,
+                    'wait': self._waits.as_dict(), 'hold': self._holds.as_dict()}
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from threading import Lock
+from typing import Callable, Final, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+__all__ = ['SharedRingWriter', 'SharedRingReader', 'DEFAULT_NAME']
+
+DEFAULT_NAME: Final[str] = 'crimea_adc'
+
+MAGIC: Final[int] = 0x41524D43  # 'CMRA'
+VERSION: Final[int] = 2
+MAX_CHANNELS: Final[int] = 8
+
+HEADER_DTYPE: Final[np.dtype] = np.dtype([
+    ('magic', '<u4'),
+    ('version', '<u4'),
+    ('sequence', '<u8'),  # odd while the writer changes the frames or the header, so the readers know to retry
+    ('writer_pid', '<u8'),  # the process that owns the segment
+    ('generation', '<u8'),  # changes every time the channels or the rate do; the frames of the earlier ones are gone
+    ('write_index', '<u8'),  # how many frames have been written since the generation began
+    ('capacity', '<u8'),  # how many frames the ring holds
+    ('sample_rate', '<f8'),  # frames per second
+    ('timestamp', '<f8'),  # `time.perf_counter()` of the last frame; it's the same clock for all the local processes
+    ('channels_count', '<u4'),
+    ('channels', '<i4', (MAX_CHANNELS,)),
+])
+# keep the frames cache-line aligned
+DATA_OFFSET: Final[int] = -(-HEADER_DTYPE.itemsize // 64) * 64
+
+# how many times a reader copies the frames again if the writer has changed them meanwhile
+READ_ATTEMPTS: Final[int] = 4
+
+
+_attaching: Lock = Lock()
+
+
+def _attach(name: str) -> SharedMemory:
+    """ open an existing segment without letting this process destroy it at exit """
+    try:
+        return SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        pass
+    # before Python 3.13, any process that opens a segment has its resource tracker unlink the segment at exit
+    with _attaching:
+        register: Callable[[str, str], None] = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name == 'nt':
+        # a named segment lives only while a process has it open, so the one found is in use
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedRingWriter:
+    """
+    the frames of the ADC as a ring buffer in shared memory: a header and `capacity` × 8 float32 voltages;
+    to be fed from a single thread, as a block consumer of `adc.ADC`
+    """
+
+    def __init__(self, name: str = DEFAULT_NAME, capacity: int = 1 << 18) -> None:
+        if capacity <= 0:
+            raise ValueError(f'Invalid capacity: {capacity}')
+        size: int = DATA_OFFSET + capacity * MAX_CHANNELS * np.dtype(np.float32).itemsize
+        try:
+            self._shared_memory: SharedMemory = SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            existing: SharedMemory = _attach(name)
+            header: np.ndarray = np.ndarray((), dtype=HEADER_DTYPE, buffer=existing.buf).copy()
+            existing.close()
+            if header['magic'] != MAGIC or header['version'] != VERSION:
+                raise FileExistsError(f'{name} is a shared memory segment of something else')
+            if _process_alive(int(header['writer_pid'])):
+                raise FileExistsError(f'{name} is published by the running process {header["writer_pid"]}')
+            # left by a process that has crashed
+            stale: SharedMemory = SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self._shared_memory = SharedMemory(name=name, create=True, size=size)
+        self.name: str = name
+        self._header: np.ndarray = np.ndarray((), dtype=HEADER_DTYPE, buffer=self._shared_memory.buf)
+        self._frames: np.ndarray = np.ndarray((capacity, MAX_CHANNELS), dtype=np.float32,
+                                              buffer=self._shared_memory.buf, offset=DATA_OFFSET)
+        self._header['capacity'] = capacity
+        self._header['writer_pid'] = os.getpid()
+        self._header['version'] = VERSION
+        self._header['magic'] = MAGIC
+
+    @property
+    def capacity(self) -> int:
+        return self._frames.shape[0]
+
+    def configure(self, channels: Iterable[int], sample_rate: float) -> None:
+        """ start a new generation of frames for the channels taken at `sample_rate` frames per second """
+        channels = list(channels)
+        if len(channels) > MAX_CHANNELS:
+            raise ValueError(f'Too many channels: {len(channels)}')
+        self._header['sequence'] += 1
+        self._header['channels'] = -1
+        self._header['channels'][:len(channels)] = channels
+        self._header['channels_count'] = len(channels)
+        self._header['sample_rate'] = sample_rate
+        self._header['write_index'] = 0
+        self._header['generation'] += 1
+        self._header['sequence'] += 1
+
+    def write(self, block: np.ndarray, timestamp: float) -> None:
+        """ append the frames; `timestamp` is the time of the last one """
+        frames_count: int = block.shape[0]
+        channels_count: int = min(block.shape[1], int(self._header['channels_count']))
+        self._header['sequence'] += 1
+        if frames_count > self.capacity:
+            skipped: int = frames_count - self.capacity
+            block = block[skipped:]
+            self._header['write_index'] += skipped
+            frames_count = self.capacity
+        start: int = int(self._header['write_index']) % self.capacity
+        stop: int = start + frames_count
+        if stop <= self.capacity:
+            self._frames[start:stop, :channels_count] = block[:, :channels_count]
+        else:
+            self._frames[start:, :channels_count] = block[:self.capacity - start, :channels_count]
+            self._frames[:stop - self.capacity, :channels_count] = block[self.capacity - start:, :channels_count]
+        self._header['timestamp'] = timestamp
+        self._header['write_index'] += frames_count
+        self._header['sequence'] += 1
+
+    def close(self) -> None:
+        self._header = np.zeros((), dtype=HEADER_DTYPE)
+        self._frames = np.empty((0, MAX_CHANNELS), dtype=np.float32)
+        self._shared_memory.close()
+        self._shared_memory.unlink()
+
+
+class SharedRingReader:
+    """ a view of the frames published by `SharedRingWriter` from another process """
+
+    def __init__(self, name: str = DEFAULT_NAME) -> None:
+        self._shared_memory: SharedMemory = _attach(name)
+        self._header: np.ndarray = np.ndarray((), dtype=HEADER_DTYPE, buffer=self._shared_memory.buf)
+        if self._header['magic'] != MAGIC or self._header['version'] != VERSION:
+            self._shared_memory.close()
+            raise RuntimeError(f'{name} is not an ADC ring of version {VERSION}')
+        # zero copies, but the writer may overwrite the frames at any moment; see `read_since` for a consistent copy
+        self.frames: np.ndarray = np.ndarray((int(self._header['capacity']), MAX_CHANNELS), dtype=np.float32,
+                                             buffer=self._shared_memory.buf, offset=DATA_OFFSET)
+        self.overruns: int = 0  # how many reads gave up, for the writer kept changing the frames being copied
+
+    @property
+    def capacity(self) -> int:
+        return self.frames.shape[0]
+
+    @property
+    def generation(self) -> int:
+        return int(self._header['generation'])
+
+    @property
+    def write_index(self) -> int:
+        return int(self._header['write_index'])
+
+    @property
+    def sample_rate(self) -> float:
+        return float(self._header['sample_rate'])
+
+    @property
+    def timestamp(self) -> float:
+        return float(self._header['timestamp'])
+
+    @property
+    def channels(self) -> List[int]:
+        return self._header['channels'][:int(self._header['channels_count'])].tolist()
+
+    def read_since(self, index: int) -> Tuple[np.ndarray, int]:
+        """
+        copy the frames written since `index` that are still there;
+        return them and the index to read from the next time; an index ahead of the writer reads from the start;
+        if the writer keeps changing the frames while they are being copied, count an overrun and return none
+        """
+        for _ in range(READ_ATTEMPTS):
+            sequence: int = int(self._header['sequence'])
+            if sequence % 2:  # the writer is busy
+                time.sleep(0.)
+                continue
+            write_index: int = self.write_index
+            channels_count: int = int(self._header['channels_count'])
+            start: int = max(0 if index > write_index else index, write_index - self.capacity)
+            positions: np.ndarray = np.arange(start, write_index) % self.capacity
+            frames: np.ndarray = self.frames[positions, :channels_count]
+            if int(self._header['sequence']) == sequence:
+                return frames, write_index
+        self.overruns += 1
+        return np.empty((0, len(self.channels)), dtype=np.float32), index
+
+    def latest(self, count: int) -> np.ndarray:
+        """ a copy of the last `count` frames, or fewer, if there are no more """
+        return self.read_since(max(0, self.write_index - count))[0]
+
+    def close(self) -> None:
+        self.frames = np.empty((0, MAX_CHANNELS), dtype=np.float32)
+        self._header = np.zeros((), dtype=HEADER_DTYPE)
+        self._shared_memory.close()
+
+
+if __name__ == '__main__':
+    def main() -> None:
+        import argparse
+
+        ap = argparse.ArgumentParser(description='Print the live ADC voltages published by the acquisition')
+        ap.add_argument('name', nargs='?', default=DEFAULT_NAME, help='the shared memory segment name')
+        ap.add_argument('--period', type=float, default=1., help='seconds between the lines')
+        args = ap.parse_args()
+
+        reader: SharedRingReader = SharedRingReader(args.name)
+        index: int = reader.write_index
+        generation: Optional[int] = None
+        try:
+            while True:
+                time.sleep(args.period)
+                if reader.generation != generation:
+                    generation = reader.generation
+                    index = 0
+                    print('channels', reader.channels, 'at', reader.sample_rate, 'frames per second')
+                frames: np.ndarray
+                frames, index = reader.read_since(index)
+                if frames.size:
+                    print(len(frames), 'frames, medians', np.median(frames, axis=0).tolist())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            reader.close()
+
+
+    main()
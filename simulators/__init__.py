@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+""" the serial devices of the station on pseudo-terminals, for running and benchmarking it without them """
+
+from simulators.arduino import Arduino
+from simulators.davis import DavisLogger, crc_xmodem
+from simulators.ports import ENVIRONMENT_VARIABLE, environment_value, ports_from_environment, redirect_comports
+from simulators.pty_device import PTYDevice
+from simulators.smsd_controller import SMSDController
+from simulators.station import Station
+
+__all__ = ['Arduino', 'DavisLogger', 'PTYDevice', 'SMSDController', 'Station', 'crc_xmodem',
+           'ENVIRONMENT_VARIABLE', 'environment_value', 'ports_from_environment', 'redirect_comports']
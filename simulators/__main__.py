@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import time
+
+from simulators.ports import ENVIRONMENT_VARIABLE, environment_value
+from simulators.station import Station
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description='Run the serial devices of the station on pseudo-terminals')
+    ap.add_argument('--latency', type=float, default=0., help='the reply delay, in seconds')
+    ap.add_argument('--jitter', type=float, default=0., help='the random extra delay, in seconds')
+    ap.add_argument('--dropout-rate', type=float, default=0., help='the share of the replies lost')
+    ap.add_argument('--garbage-rate', type=float, default=0., help='the share of the replies after garbage bytes')
+    ap.add_argument('--baud-rate', type=int, help='the line speed to emulate, unlimited if omitted')
+    ap.add_argument('--seed', type=int, help='the random seed of the faults')
+    args = ap.parse_args()
+
+    with Station(latency=args.latency, jitter=args.jitter, dropout_rate=args.dropout_rate,
+                 garbage_rate=args.garbage_rate, baud_rate=args.baud_rate, seed=args.seed) as station:
+        print(f'{ENVIRONMENT_VARIABLE}="{environment_value(station.ports)}"', flush=True)
+        try:
+            while True:
+                time.sleep(1.)
+        except KeyboardInterrupt:
+            pass
+
+
+main()
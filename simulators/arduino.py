@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+import random
+from typing import Any, Callable, List, Optional
+
+from simulators.pty_device import PTYDevice
+
+__all__ = ['Arduino']
+
+
+class Arduino(PTYDevice):
+    """
+    the Arduino Mega of the thermostats: `R`, `P`, `S`, `Q`, and `V<pin>` get a text line back,
+    `I<index>` then `T<value>` set a setpoint, `H<pin>` and `L<pin>` set a digital output, `E` and `D` switch
+    the thermostats on and off; the analog pins read `voltage(pin)`, 512 if it's not given
+    """
+
+    TERMINATOR: bytes = b'\n'
+    LINE_SPEED: Optional[int] = 9600
+
+    def __init__(self, *, sensors_count: int = 3, voltage: Optional[Callable[[int], int]] = None,
+                 **faults: Any) -> None:
+        super().__init__(**faults)
+        self.setpoints: List[int] = [30] * sensors_count
+        self.states: List[bool] = [False] * sensors_count
+        self.enabled: bool = False
+        self.voltage: Callable[[int], int] = voltage or (lambda pin: 512)
+        self._index: int = 0
+        self._noise: random.Random = random.Random(0)
+
+    @property
+    def temperatures(self) -> List[float]:
+        return [round(setpoint - (0. if self.enabled else 5.) + self._noise.gauss(0., 0.1), 2)
+                for setpoint in self.setpoints]
+
+    def reply(self, command: bytes) -> Optional[bytes]:
+        text: str = command.decode('ascii', errors='replace').strip()
+        if not text:
+            return None
+        name: str = text[0]
+        argument: str = text[1:]
+        if name == 'R':
+            return ','.join(map(str, self.temperatures)).encode() + b'\r\n'
+        if name == 'P':
+            return ','.join(map(str, self.setpoints)).encode() + b'\r\n'
+        if name == 'S':
+            return ','.join(str(int(state)) for state in self.states).encode() + b'\r\n'
+        if name == 'Q':
+            return f'{int(self.enabled)}\r\n'.encode()
+        if name == 'V' and argument.isdigit():
+            return f'{self.voltage(int(argument))}\r\n'.encode()
+        if name == 'I' and argument.isdigit():
+            self._index = int(argument)
+        elif name == 'T' and argument.isdigit() and self._index < len(self.setpoints):
+            self.setpoints[self._index] = int(argument)
+        elif name in 'HL' and argument.isdigit() and int(argument) < len(self.states):
+            self.states[int(argument)] = name == 'H'
+        elif name in 'ED':
+            self.enabled = name == 'E'
+        return None
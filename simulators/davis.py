@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+import struct
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from simulators.pty_device import PTYDevice
+
+__all__ = ['DavisLogger', 'crc_xmodem']
+
+ACK: bytes = b'\x06'
+
+# the fields of a LOOP packet after 'LOO', as the Vantage Pro serial protocol lists them
+LOOP_FIELDS: List[Tuple[str, str, int]] = [
+    ('BarometerTrend', 'b', 0), ('PacketType', 'B', 0), ('NextRec', 'H', 0), ('Barometer', 'H', 29920),
+    ('InsideTemp', 'h', 720), ('InsideHum', 'B', 40), ('OutsideTemp', 'h', 590), ('WindSpeed', 'B', 5),
+    ('AvgWindSpeed', 'B', 4), ('WindDir', 'H', 180), ('XtraTemps', '7b', -1), ('SoilTemps', '4b', -1),
+    ('LeafTemps', '4b', -1), ('OutsideHum', 'B', 60), ('XtraHums', '7B', 255), ('RainRate', 'H', 0),
+    ('UVLevel', 'B', 0xff), ('SolarRad', 'H', 0x7fff), ('StormRain', 'H', 0), ('StormStart', 'H', 0xffff),
+    ('RainDay', 'H', 0), ('RainMonth', 'H', 0), ('RainYear', 'H', 0), ('ETDay', 'H', 0), ('ETMonth', 'H', 0),
+    ('ETYear', 'H', 0), ('SoilMoist', 'I', 0xffffffff), ('LeafWet', 'I', 0xffffff), ('AlarmInside', 'B', 0),
+    ('AlarmRain', 'B', 0), ('AlarmOut', 'H', 0), ('AlarmXtra', '8B', 0), ('AlarmSL', 'I', 0), ('XmitBatt', 'B', 0),
+    ('BattLevel', 'H', 700), ('ForecastIcon', 'B', 8), ('Forecast', 'B', 0), ('Sunrise', 'H', 612),
+    ('Sunset', 'H', 1847),
+]
+# the HILOWS packet, 436 bytes, only the barometer and the temperatures filled in
+HILOWS_FORMAT: str = '<HHHHHHHH BHBB hhhhhhhh BBHHBBBB hhhhhhhh hhhhhhhh hhhh hhhh HHHH HHHH BHBB HHHHH 150B80B40B40B'
+
+
+def crc_xmodem(data: bytes) -> int:
+    """ CRC-CCITT with the zero initial value, as the console appends it, most significant byte first """
+    crc: int = 0
+    byte: int
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021 if crc & 0x8000 else crc << 1) & 0xffff
+    return crc
+
+
+def _with_crc(data: bytes) -> bytes:
+    return data + struct.pack('>H', crc_xmodem(data))
+
+
+class DavisLogger(PTYDevice):
+    """
+    the Davis Instruments weather station data logger: it answers `LOOP 1` and `HILOWS` with ACK and a binary
+    packet with the XMODEM CRC, `GETTIME` likewise, `WRD\\x12\\x4d` with ACK and the model, and `VER` with text
+    """
+
+    TERMINATOR: bytes = b'\n'
+    LINE_SPEED: Optional[int] = 19200
+
+    def __init__(self, *, weather: Optional[Dict[str, int]] = None, **faults: Any) -> None:
+        super().__init__(**faults)
+        # the raw LOOP fields to replace the defaults with, in the units of the packet
+        self.weather: Dict[str, int] = dict(weather or {})
+
+    def loop_packet(self) -> bytes:
+        fields: List[Any] = []
+        name: str
+        code: str
+        value: int
+        for name, code, value in LOOP_FIELDS:
+            value = self.weather.get(name, value)
+            fields.extend([value] * int(code[:-1]) if len(code) > 1 else [value])
+        return _with_crc(b'LOO' + struct.pack('<' + ''.join(code for _, code, _ in LOOP_FIELDS), *fields) + b'\n\r')
+
+    @staticmethod
+    def hilows_packet() -> bytes:
+        values: List[int] = [0] * len(struct.unpack(HILOWS_FORMAT, bytes(struct.calcsize(HILOWS_FORMAT))))
+        values[:6] = [29900, 29950, 29800, 30000, 29700, 30100]
+        values[12:18] = [700, 740, 690, 760, 650, 790]
+        return _with_crc(struct.pack(HILOWS_FORMAT, *values))
+
+    def reply(self, command: bytes) -> Optional[bytes]:
+        command = command.rstrip(b'\r')
+        if not command:  # the wake-up call
+            return b'\n\r'
+        if command.startswith(b'LOOP'):
+            return ACK + self.loop_packet()
+        if command == b'HILOWS':
+            return ACK + self.hilows_packet()
+        if command == b'GETTIME':
+            now: time.struct_time = time.localtime()
+            return ACK + _with_crc(bytes([now.tm_sec, now.tm_min, now.tm_hour,
+                                          now.tm_mday, now.tm_mon, now.tm_year - 1900]))
+        if command == b'WRD\x12\x4d':
+            return ACK + b'\x10'  # Vantage Pro
+        if command == b'VER':
+            return b'\n\rOK\n\rMay  1 2012\n\r'
+        return b'\n\r'
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+import os
+from typing import Dict, List, Optional, Tuple
+
+import serial.tools.list_ports
+from serial.tools.list_ports_common import ListPortInfo
+
+__all__ = ['ENVIRONMENT_VARIABLE', 'USB_IDS', 'ports_from_environment', 'environment_value', 'redirect_comports']
+
+# `kind=device` pairs separated by semicolons, e.g., 'smsd=/dev/pts/3;davis=/dev/pts/4;arduino=/dev/pts/5'
+ENVIRONMENT_VARIABLE: str = 'CRIMEA_SERIAL_PORTS'
+
+# the vendor and product IDs the drivers look for
+USB_IDS: Dict[str, Tuple[Optional[int], Optional[int]]] = {
+    'smsd': (None, None),  # on a plain RS-232 port, found by its name
+    'davis': (0x10c4, 0xea60),
+    'arduino': (0x2341, 0x0042),
+}
+
+
+def ports_from_environment() -> Dict[str, str]:
+    """ the devices by kind that the environment variable lists, none if it isn't set """
+    ports: Dict[str, str] = {}
+    item: str
+    for item in os.environ.get(ENVIRONMENT_VARIABLE, '').split(';'):
+        if '=' in item:
+            kind: str
+            device: str
+            kind, device = item.split('=', 1)
+            ports[kind.strip()] = device.strip()
+    return ports
+
+
+def environment_value(ports: Dict[str, str]) -> str:
+    return ';'.join(f'{kind}={device}' for kind, device in ports.items())
+
+
+def redirect_comports(ports: Optional[Dict[str, str]] = None) -> bool:
+    """
+    make `serial.tools.list_ports.comports` list the given devices, or those of the environment variable,
+    instead of the real ports; False if there are none to list, so the real ports stay
+    """
+    if ports is None:
+        ports = ports_from_environment()
+    if not ports:
+        return False
+    infos: List[ListPortInfo] = []
+    kind: str
+    device: str
+    for kind, device in ports.items():
+        info: ListPortInfo = ListPortInfo(device, skip_link_detection=True)
+        info.vid, info.pid = USB_IDS.get(kind, (None, None))
+        info.description = f'{kind} simulator'
+        infos.append(info)
+    serial.tools.list_ports.comports = lambda *args, **kwargs: list(infos)
+    return True
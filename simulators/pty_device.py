@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+import os
+import random
+import re
+import select
+import termios
+import time
+import tty
+from threading import Lock, Thread
+from typing import List, Optional, Tuple
+
+__all__ = ['PTYDevice']
+
+
+class PTYDevice(Thread):
+    """
+    a serial device on a pseudo-terminal: the driver opens `device` as it opens a port; the replies come late by
+    `latency` seconds plus up to `jitter` more, get lost at `dropout_rate`, and get garbage bytes before them at
+    `garbage_rate`; with `baud_rate` given, the bytes come no faster than the line would carry them;
+    a driver that has set another speed than `LINE_SPEED` gets no replies, as from a real device;
+    the parity is not simulated: Linux drops it on a PTY, and some kernels refuse to reopen a PTY with it
+    """
+
+    TERMINATOR: bytes = b'\n'
+    LINE_SPEED: Optional[int] = None  # the speed the device talks at, any if None
+    GARBAGE_LENGTH: int = 4
+
+    def __init__(self, *, latency: float = 0., jitter: float = 0., dropout_rate: float = 0.,
+                 garbage_rate: float = 0., baud_rate: Optional[int] = None, seed: Optional[int] = None) -> None:
+        super().__init__()
+        self.daemon = True
+        self.latency: float = latency
+        self.jitter: float = jitter
+        self.dropout_rate: float = dropout_rate
+        self.garbage_rate: float = garbage_rate
+        self.baud_rate: Optional[int] = baud_rate
+        self._random: random.Random = random.Random(seed)
+        self._master: int
+        self._slave: int
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)  # no echo and no line editing, as on a real port
+        self.device: str = os.ttyname(self._slave)
+        self._write_lock: Lock = Lock()
+        self._running: bool = False
+        self.commands_count: int = 0
+        self.mismatched: int = 0  # the commands not replied to for the driver has set another speed
+        self.dropouts: int = 0
+        self.garbled: int = 0
+
+    def reply(self, command: bytes) -> Optional[bytes]:
+        """ what the device sends back to a command, without the terminator; None if nothing """
+        raise NotImplementedError
+
+    def split(self, buffer: bytes) -> Tuple[List[bytes], bytes]:
+        """ the complete commands in the buffer and what's left of it """
+        commands: List[bytes] = buffer.split(self.TERMINATOR)
+        return commands[:-1], commands[-1]
+
+    def write(self, data: bytes) -> None:
+        """ send the bytes as the line would carry them """
+        with self._write_lock:
+            if not self._running:  # stopped, and the PTY is closed
+                return
+            if self.baud_rate:
+                time.sleep(10. * len(data) / self.baud_rate)  # a start bit, 8 data bits, and a stop bit each
+            os.write(self._master, data)
+
+    @property
+    def line_speed(self) -> Optional[int]:
+        """ the speed the driver has set on the port, None if it is not a standard one """
+        # only read: the settings belong to the driver that has the port open
+        speed: int = termios.tcgetattr(self._slave)[5]
+        name: str
+        for name in dir(termios):
+            if re.fullmatch(r'B\d+', name) and getattr(termios, name) == speed:
+                return int(name[1:])
+        return None
+
+    def _respond(self, command: bytes) -> None:
+        self.commands_count += 1
+        if self.LINE_SPEED is not None and self.line_speed != self.LINE_SPEED:
+            self.mismatched += 1
+            return
+        response: Optional[bytes] = self.reply(command)
+        if response is None:
+            return
+        if self._random.random() < self.dropout_rate:
+            self.dropouts += 1
+            return
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self._random.uniform(0., self.jitter))
+        if self._random.random() < self.garbage_rate:
+            self.garbled += 1
+            response = bytes(self._random.randrange(1, 256) for _ in range(self.GARBAGE_LENGTH)) + response
+        self.write(response)
+
+    def run(self) -> None:
+        self._running = True
+        buffer: bytes = b''
+        while self._running:
+            if not select.select([self._master], [], [], 0.1)[0]:
+                continue
+            try:
+                buffer += os.read(self._master, 1024)
+            except OSError:  # nobody has the port open
+                time.sleep(0.01)
+                continue
+            commands: List[bytes]
+            commands, buffer = self.split(buffer)
+            command: bytes
+            for command in commands:
+                self._respond(command)
+
+    def stop(self) -> None:
+        with self._write_lock:
+            self._running = False
+        if self.is_alive():
+            self.join()
+        os.close(self._master)
+        os.close(self._slave)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import math
+import re
+import time
+from threading import Timer
+from typing import Any, Optional
+
+from simulators.pty_device import PTYDevice
+
+__all__ = ['SMSDController']
+
+
+class SMSDController(PTYDevice):
+    """
+    the SMSD4.2RS-232 stepper motor controller: it echoes every `*`-terminated command followed by `E10*`,
+    or by `E16*` if the command is unknown, and sends `E14*` when a motion ends;
+    the position is counted in steps, home being every `steps_per_turn` steps
+    """
+
+    TERMINATOR: bytes = b'*'
+    LINE_SPEED: Optional[int] = 9600
+    COMMAND: re.Pattern = re.compile(r'(?P<name>[A-Z]{2})(?P<value>\d*)')
+    COMMANDS: frozenset = frozenset(('DL', 'DR', 'RS', 'MV', 'SD', 'EN', 'DS', 'ST', 'HM', 'MH', 'ML', 'WH', 'WL'))
+
+    def __init__(self, *, steps_per_turn: int = 200, speed: int = 100, **faults: Any) -> None:
+        super().__init__(**faults)
+        self.steps_per_turn: int = steps_per_turn
+        self.speed: int = speed  # steps per second
+        self.forward: bool = True
+        self.enabled: bool = False
+        self._start_position: float = 0.
+        self._target_position: float = 0.
+        self._start_time: float = 0.
+        self._stop_time: float = 0.
+        self._completion: Optional[Timer] = None
+
+    @property
+    def position(self) -> float:
+        """ where the motor is now, in steps from home, during a motion too """
+        now: float = time.perf_counter()
+        if now >= self._stop_time:
+            return self._target_position
+        return self._start_position + ((self._target_position - self._start_position)
+                                       * (now - self._start_time) / (self._stop_time - self._start_time))
+
+    def _move_to(self, position: float) -> None:
+        self._start_position = self.position
+        self._start_time = time.perf_counter()
+        self._target_position = position
+        self._stop_time = self._start_time + abs(position - self._start_position) / self.speed
+        if self._completion is not None:
+            self._completion.cancel()
+        self._completion = Timer(self._stop_time - self._start_time, self.write, (b'E14*',))
+        self._completion.daemon = True
+        self._completion.start()
+
+    def _halt(self) -> None:
+        position: float = self.position
+        self._target_position = self._start_position = position
+        self._stop_time = 0.
+        if self._completion is not None:
+            self._completion.cancel()
+
+    def reply(self, command: bytes) -> Optional[bytes]:
+        command = command.lstrip(b'\0')
+        match: Optional[re.Match] = self.COMMAND.fullmatch(command.decode('ascii', errors='replace'))
+        if match is None or match['name'] not in self.COMMANDS:
+            return command + b'*E16*'
+        name: str = match['name']
+        value: int = int(match['value'] or 0)
+        if name in ('DL', 'DR'):
+            self.forward = name == 'DL'
+        elif name == 'RS':
+            self.forward = not self.forward
+        elif name == 'SD' and value:
+            self.speed = value
+        elif name in ('EN', 'DS'):
+            self.enabled = name == 'EN'
+        elif name == 'ST':
+            self._halt()
+        elif name == 'MV':
+            self._move_to(self.position + (value if self.forward else -value))
+        elif name in ('HM', 'MH', 'ML'):
+            # to the next home in the direction set
+            turns: float = self.position / self.steps_per_turn
+            self._move_to(float((math.floor(turns) + 1 if self.forward else math.ceil(turns) - 1)
+                                * self.steps_per_turn))
+        return command + b'*E10*'
+
+    def stop(self) -> None:
+        if self._completion is not None:
+            self._completion.cancel()
+        super().stop()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Dict
+
+from simulators.arduino import Arduino
+from simulators.davis import DavisLogger
+from simulators.pty_device import PTYDevice
+from simulators.smsd_controller import SMSDController
+
+__all__ = ['Station']
+
+A0_PIN: int = 54
+
+
+class Station:
+    """
+    the motor controller, the weather station, and the Arduino together, with the same faults;
+    the A0 pin of the Arduino reads `home_voltage` within `home_width` steps past a home of the motor
+    """
+
+    def __init__(self, *, home_voltage: int = 1000, home_width: int = 2, **faults: Any) -> None:
+        self.motor: SMSDController = SMSDController(**faults)
+        self.weather_station: DavisLogger = DavisLogger(**faults)
+        self.arduino: Arduino = Arduino(voltage=self._voltage, **faults)
+        self.home_voltage: int = home_voltage
+        self.home_width: int = home_width
+
+    def _voltage(self, pin: int) -> int:
+        if pin == A0_PIN and self.motor.position % self.motor.steps_per_turn < self.home_width:
+            return self.home_voltage
+        return 100
+
+    @property
+    def devices(self) -> Dict[str, PTYDevice]:
+        return {'smsd': self.motor, 'davis': self.weather_station, 'arduino': self.arduino}
+
+    @property
+    def ports(self) -> Dict[str, str]:
+        """ the device names by kind, for `simulators.redirect_comports` """
+        return {kind: device.device for kind, device in self.devices.items()}
+
+    def start(self) -> 'Station':
+        device: PTYDevice
+        for device in self.devices.values():
+            device.start()
+        return self
+
+    def stop(self) -> None:
+        device: PTYDevice
+        for device in self.devices.values():
+            device.stop()
+
+    def __enter__(self) -> 'Station':
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
@@ -2,12 +2,16 @@
 # -*- coding: utf-8 -*-
 
 import time
-from threading import Thread
-from typing import Optional, Union
+from concurrent.futures import Future
+from queue import Empty, Queue
+from threading import Condition, Thread
+from typing import Any, Callable, List, Optional, Set, Tuple, Union
 
 import serial
 import serial.tools.list_ports
 
+from serial_transaction import TransactionLock
+
 
 class MicrosteppingMode:
     SINGLE = 1
@@ -39,13 +43,40 @@ class MicrosteppingMode:
 
 
 class Motor(Thread):
+    """
+    the thread owns the serial port and does the commands from its queue one after another;
+    the commands return futures of the controller replies
+    """
+
+    # how many queued plain commands may go to the controller in one write
+    MAX_PIPELINED_COMMANDS: int = 8
+    # the commands that start a motion, which ends with the `E14` reply, if the controller sends it
+    MOTION_COMMANDS: Tuple[str, ...] = ('MV', 'HM', 'MH', 'ML')
+    # how often to look for the `E14` reply while the motor moves
+    MOTION_POLL_PERIOD: float = 0.02
+    # until the controller has reported the end of a motion, it is taken to last this many times the estimate
+    # plus the delay, in seconds, for the acceleration and the serial latency
+    UNREPORTED_MOTION_MARGIN: float = 1.2
+    UNREPORTED_MOTION_DELAY: float = 0.5
+
     def __init__(self, device, microstepping_mode=MicrosteppingMode.SINGLE, speed: float = 90, ratio: float = 1.):
         Thread.__init__(self)
         self.daemon = True
         self._ser = serial.Serial()
         self._ser_device = device
         self._ser_banned = ()
-        self._communicating: bool = False
+        # a plain command list, or a function to call, with the future of its result; None stops the thread
+        self._queue: Queue = Queue()
+        # only the thread talks to the controller, so the lock never waits; it times the round trips it holds
+        self.transactions: TransactionLock = TransactionLock(timeout=3.)
+        # what the last successful `DL` or `DR` has set, None if unknown
+        self._direction: Optional[str] = None
+        # the motions queued and not sent yet, and when the one going on should be over at the latest
+        self._motion: Condition = Condition()
+        self._queued_motions: Set[Future] = set()
+        self._motion_deadline: Optional[float] = None
+        # whether the controller has been seen to report the end of a motion with `E14`
+        self._reports_completion: bool = False
         self.microstepping_mode = MicrosteppingMode(mode=microstepping_mode)
         self.abort: bool = False
         self._gear_ratio: float = ratio
@@ -71,7 +102,7 @@ class Motor(Thread):
         return 360. / 200. / self.microstepping_mode / self._gear_ratio
 
     def _open_serial(self):
-        self._communicating = False
+        self._direction = None
         ports = serial.tools.list_ports.comports()
         if set(port.device for port in ports) <= set(self._ser_banned):
             self._ser_banned = ()
@@ -94,23 +125,12 @@ class Motor(Thread):
                     pass
                 else:
                     print(self._ser.port, "opened for the SMSD4.2RS-232")
-                    self.disable()
-                    self.speed(self.steps_to_degrees(self._speed))
-                    self._communicating = False
+                    self._disable()
+                    self._set_speed(self._speed)
                     break
         if not self._ser.is_open:
             time.sleep(1)
 
-    def _block(self, timeout: float = 3.) -> bool:
-        i = 0
-        dt = 0.1
-        while self._communicating:
-            time.sleep(dt)
-            i += 1
-            if dt * i > timeout:
-                return False
-        return True
-
     @staticmethod
     def decode_response(resp: str) -> str:
         replies = {'E10': 'The command successfully accepted',
@@ -126,23 +146,16 @@ class Motor(Thread):
             return f'Unknown reply: {resp}'
 
     def _do(self, cmd: str) -> Union[bool, str]:
-        if not self._block():
-            print("driver is very busy to respond to", cmd)
-            return False
+        """ a single round trip; to be called from the thread only """
         # print('command:', cmd)
         while self._ser.is_open:
             msg = cmd + '*'
             try:
-                self._communicating = True
                 self._ser.write(msg.encode('ascii'))
                 self._ser.flush()
-                c = self._ser.read(len(msg) + 4)
-                while len(c) > 0 and c[0] == 0:
-                    c = c[1:] + self._ser.read(1)
+                c = self._read_reply(len(msg) + 4)
                 self._ser.flush()
-                self._communicating = False
             except (IOError, serial.SerialException, serial.SerialTimeoutException, UnicodeEncodeError):
-                self._communicating = False
                 continue
             if len(c) == 0:
                 self._ser.close()
@@ -164,6 +177,7 @@ class Motor(Thread):
                     self._ser.open()
                 continue
             # print(msg, self.decode_response(resp[1]))
+            self._note(cmd, resp[1])
             return resp[1]
         else:
             if self._ser.port not in self._ser_banned:
@@ -171,85 +185,283 @@ class Motor(Thread):
             self._open_serial()
         return False
 
-    def forward(self) -> Union[bool, str]:
-        return self._do('DL')
+    def _do_all(self, commands: List[str]) -> List[Union[bool, str]]:
+        """
+        send the commands in one write and read the replies in one go, saving a round trip per command;
+        should the replies come garbled, the commands not confirmed are done one by one
+        """
+        if len(commands) < 2 or not self._ser.is_open:
+            return [self._do(cmd) for cmd in commands]
+        msg: str = ''.join(cmd + '*' for cmd in commands)
+        replies: List[Union[bool, str]] = []
+        resp: List[str]
+        try:
+            self._ser.write(msg.encode('ascii'))
+            self._ser.flush()
+            c = self._read_reply(len(msg) + 4 * len(commands))
+            resp = c.decode('ascii').split('*')
+        except (IOError, serial.SerialException, serial.SerialTimeoutException, UnicodeError):
+            resp = []
+        for index, cmd in enumerate(commands):
+            if resp[2 * index:2 * index + 1] != [cmd] or len(resp) < 2 * index + 2:
+                break
+            self._note(cmd, resp[2 * index + 1])
+            replies.append(resp[2 * index + 1])
+        if len(replies) < len(commands):
+            print('wrong response:', msg, resp)
+        return replies + [self._do(cmd) for cmd in commands[len(replies):]]
+
+    def _read_reply(self, size: int) -> bytes:
+        """ read `size` bytes of replies, skipping the padding and the `E14` of a motion that has ended """
+        c = self._ser.read(size)
+        while len(c) > 0 and (c[0] == 0 or c.startswith(b'E14*')):
+            if c[0] == 0:
+                c = c[1:] + self._ser.read(1)
+            else:
+                self._motion_completed()
+                c = c[4:] + self._ser.read(4)
+        return c
+
+    def _note(self, cmd: str, reply: str) -> None:
+        """ follow the state of the controller that the commands change """
+        if cmd in ('DL', 'DR') and reply == 'E10':
+            self._direction = cmd
+        elif cmd == 'RS' and reply == 'E10':
+            self._direction = None  # the controller has turned it over
+        elif cmd.startswith(('DL', 'DR') + self.MOTION_COMMANDS) and reply != 'E10':
+            self._direction = None  # the controller may be in any state after an error
+        if cmd.startswith(self.MOTION_COMMANDS) and reply == 'E10':
+            steps: str = cmd[2:]
+            estimate: float = (int(steps) / self._speed if steps.isdigit() and self._speed
+                               else self.time_to_turn(360.) or 0.)
+            with self._motion:
+                # with `E14` coming, the estimate is only a safeguard; without it, it's all there is
+                self._motion_deadline = (time.perf_counter()
+                                         + (2. * estimate + 1. if self._reports_completion
+                                            else self.UNREPORTED_MOTION_MARGIN * estimate
+                                            + self.UNREPORTED_MOTION_DELAY))
+        elif cmd == 'ST1' and reply == 'E10':
+            self._motion_completed(reported=False)
+
+    def _motion_completed(self, reported: bool = True) -> None:
+        with self._motion:
+            self._reports_completion |= reported
+            self._motion_deadline = None
+            self._motion.notify_all()
+
+    def _check_motion(self) -> None:
+        """ look for the `E14` reply, or give up on it when the motion should be over """
+        # should the port be busy, look on the next tick
+        if self.transactions.acquire(timeout=self.MOTION_POLL_PERIOD):
+            try:
+                if self._ser.is_open and self._ser.in_waiting and b'E14*' in self._ser.read(self._ser.in_waiting):
+                    self._motion_completed()
+                    return
+            except (IOError, serial.SerialException):
+                pass
+            finally:
+                self.transactions.release()
+        with self._motion:
+            if self._motion_deadline is not None and time.perf_counter() > self._motion_deadline:
+                if self._reports_completion:
+                    print('no motion completion reported by', self._ser.port)
+                self._motion_completed(reported=False)
+
+    def _forget_motion(self, future: Future) -> None:
+        with self._motion:
+            self._queued_motions.discard(future)
+            self._motion.notify_all()
+
+    def _enqueue(self, task: Any, motion: bool = False) -> Future:
+        future: Future = Future()
+        if motion:
+            with self._motion:
+                self._queued_motions.add(future)
+            future.add_done_callback(self._forget_motion)
+        self._queue.put((task, future))
+        return future
+
+    def submit(self, *commands: str) -> Future:
+        """ queue plain commands to be sent together; the future holds the reply to the last one """
+        return self._enqueue(list(commands), motion=any(cmd.startswith(self.MOTION_COMMANDS) for cmd in commands))
+
+    def _submit_call(self, function: Callable[..., Any], *args: Any, motion: bool = False) -> Future:
+        """ queue a function to be called by the thread, for the commands that depend on the replies """
+        return self._enqueue((function, args), motion=motion)
+
+    @property
+    def idle(self) -> bool:
+        """ whether no motion is queued or going on """
+        with self._motion:
+            return not self._queued_motions and self._motion_deadline is None
+
+    def wait_until_idle(self, timeout: Optional[float] = None) -> bool:
+        """ wait for the queued motions to end; False if they have not in `timeout` seconds """
+        with self._motion:
+            return self._motion.wait_for(lambda: not self._queued_motions and self._motion_deadline is None,
+                                         timeout)
+
+    def _next_item(self) -> Optional[Tuple[Any, Future]]:
+        """ the next item of the queue, watching for the end of the motion meanwhile """
+        while True:
+            with self._motion:
+                moving: bool = self._motion_deadline is not None
+            if not moving:
+                return self._queue.get()
+            try:
+                return self._queue.get(timeout=self.MOTION_POLL_PERIOD)
+            except Empty:
+                self._check_motion()
+
+    def _take_plain_commands(self, batch: List[Tuple[List[str], Future]]) -> Optional[Tuple[Any, Future]]:
+        """ add the plain commands waiting in the queue to the batch; return the item that has stopped it, if any """
+        commands_count: int = sum(len(commands) for commands, _ in batch)
+        while commands_count < self.MAX_PIPELINED_COMMANDS:
+            try:
+                item: Optional[Tuple[Any, Future]] = self._queue.get_nowait()
+            except Empty:
+                return None
+            if item is None or isinstance(item[0], tuple):
+                return item
+            if item[1].set_running_or_notify_cancel():
+                batch.append(item)
+                commands_count += len(item[0])
+        return None
+
+    def run(self) -> None:
+        pending: Optional[Tuple[Any, Future]] = None
+        while True:
+            item: Optional[Tuple[Any, Future]] = pending if pending is not None else self._next_item()
+            pending = None
+            if item is None:
+                break
+            task: Any
+            future: Future
+            task, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            if isinstance(task, tuple):
+                function: Callable[..., Any]
+                args: Tuple[Any, ...]
+                function, args = task
+                try:
+                    with self.transactions:
+                        future.set_result(function(*args))
+                except Exception as ex:
+                    future.set_exception(ex)
+                continue
+            batch: List[Tuple[List[str], Future]] = [(task, future)]
+            pending = self._take_plain_commands(batch)
+            try:
+                with self.transactions:
+                    replies: List[Union[bool, str]] = self._do_all([cmd for commands, _ in batch
+                                                                     for cmd in commands])
+            except Exception as ex:
+                for _, future in batch:
+                    future.set_exception(ex)
+                continue
+            commands: List[str]
+            for commands, future in batch:
+                results: List[Union[bool, str]] = replies[:len(commands)]
+                replies = replies[len(commands):]
+                future.set_result((results[-1] if all(results) else False) if results else True)
+        self._ser.close()
+
+    def close(self) -> None:
+        """ let the thread finish the queued commands and stop """
+        self._queue.put(None)
 
-    def backward(self) -> Union[bool, str]:
-        return self._do('DR')
+    def forward(self) -> Future:
+        return self.submit('DL')
 
-    def reverse(self) -> Union[bool, str]:
-        return self._do('RS')
+    def backward(self) -> Future:
+        return self.submit('DR')
+
+    def reverse(self) -> Future:
+        return self.submit('RS')
+
+    def _direction_commands(self, steps: int) -> List[str]:
+        """ `DL` or `DR` for the sign of `steps`, unless the controller is set so already """
+        direction: str = 'DL' if steps > 0 else 'DR'
+        return [] if direction == self._direction else [direction]
+
+    def _move(self, steps: int) -> Union[bool, str]:
+        if steps == 0:
+            return True
+        replies: List[Union[bool, str]] = self._do_all(self._direction_commands(steps) + [f'MV{abs(steps)}'])
+        return all(replies) and replies[-1]
 
-    def move(self, angle=None) -> Union[bool, str]:
+    def move(self, angle=None) -> Future:
         if angle is None:
-            return self._do('MV')
+            return self.submit('MV')
         steps = self.degrees_to_steps(angle)
         if abs(steps) <= 10000000:
-            if steps > 0:
-                return self.forward() and self._do(f'MV{steps}')
-            elif steps < 0:
-                return self.backward() and self._do(f'MV{-steps}')
-            else:
-                return True
+            return self._submit_call(self._move, steps, motion=True)
         else:
             raise ValueError(f'Too many steps: {steps}')
 
-    def stop(self) -> Union[bool, str]:
-        return self._do('ST1')
+    def stop(self) -> Future:
+        return self.submit('ST1')
+
+    def _set_speed(self, speed: int) -> bool:
+        replies: List[Union[bool, str]] = self._do_all(self._direction_commands(speed) + [f'SD{abs(speed)}'])
+        if all(replies):
+            self._speed = abs(speed)
+            return True
+        return False
 
-    def speed(self, speed=None) -> Union[bool, float]:  # steps/sec
+    def speed(self, speed=None) -> Union[Future, float]:  # steps/sec
+        """ the speed in degrees per second, or the future of setting it """
         if speed is None:
             return self.steps_to_degrees(self._speed)
         speed = self.degrees_to_steps(speed)
         if 0 < abs(speed) <= 10000:
-            if speed > 0:
-                if self.forward() and self._do(f'SD{speed}'):
-                    self._speed = speed
-                    return True
-            elif speed < 0:
-                if self.backward() and self._do(f'SD{-speed}'):
-                    self._speed = -speed
-                    return True
+            return self._submit_call(self._set_speed, speed)
         elif speed == 0:
             raise ValueError(f'Too low speed: {speed}')
         else:
             raise ValueError(f'Too much speed: {speed}')
-        return False
 
     def gear_ratio(self, ratio=None) -> float:
         if ratio is not None and ratio != 0:
             self._gear_ratio = ratio
         return self._gear_ratio
 
-    def move_high(self) -> Union[bool, str]:
+    def move_high(self) -> Future:
         """ Indefinite movement, till signal to input IN2 """
-        return self._do('MH')
+        return self.submit('MH')
 
-    def move_low(self) -> Union[bool, str]:
+    def move_low(self) -> Future:
         """ Indefinite movement, till signal to input IN1 """
-        return self._do('ML')
+        return self.submit('ML')
 
-    def move_home(self) -> Union[bool, str]:
+    def move_home(self) -> Future:
         """ Indefinite movement, till signal to input “0” (zero limit switch) """
-        return self._do('HM')
+        return self.submit('HM')
 
-    def enable(self) -> Union[bool, str]:
+    def _enable(self) -> Union[bool, str]:
         return self._do('EN') or self._do('EN')
 
-    def disable(self) -> Union[bool, str]:
+    def enable(self) -> Future:
+        return self._submit_call(self._enable)
+
+    def _disable(self) -> Union[bool, str]:
         r = self._do('DS')
         if r == 'E16':
-            self.stop()
+            self._do('ST1')
             r = False
         return r or self._do('DS')
 
-    def wait_high(self) -> Union[bool, str]:
+    def disable(self) -> Future:
+        return self._submit_call(self._disable)
+
+    def wait_high(self) -> Future:
         """ Indefinite pause, wait for a signal to input IN2 """
-        return self._do('WH')
+        return self.submit('WH')
 
-    def wait_low(self) -> Union[bool, str]:
+    def wait_low(self) -> Future:
         """ Indefinite pause, wait for a signal to input IN1 """
-        return self._do('WL')
+        return self.submit('WL')
 
     def follow_route_in_background(self, route, speed, delay) -> bool:
         if not route:
@@ -260,8 +472,8 @@ class Motor(Thread):
         for prev_angle, angle in zip(route[:-1], route[1:]):
             step = angle - prev_angle
             if step:
-                self.move(self.degrees_to_steps(step))
-                time.sleep(abs(step) / speed)
+                self.move(step)
+                self.wait_until_idle()
             if self.abort:
                 self.abort = False
                 break
@@ -271,15 +483,19 @@ class Motor(Thread):
     def follow_route(self, route, speed, delay):
         Thread(target=lambda: self.follow_route_in_background(route, speed, delay)).start()
 
-    def open(self, device=None):
+    def open(self, device=None) -> Future:
         if isinstance(device, str):
             self._ser_device = device
-        self._open_serial()
+        return self._submit_call(self._open_serial)
 
 
 if __name__ == '__main__':
     motor = Motor(device='/dev/ttyS0')
+    motor.start()
     try:
-        motor.open()
+        motor.open().result()
     except (KeyboardInterrupt, SystemExit):
         exit(0)
+    finally:
+        motor.close()
+        motor.join()
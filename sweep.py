@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Dict, List, NamedTuple
+
+import numpy as np
+
+from running_stats import RunningStatistics
+
+__all__ = ['SweepOrigin', 'angles_at', 'bin_by_angle', 'sweep_records']
+
+
+class SweepOrigin(NamedTuple):
+    time: float  # seconds since the epoch when the motor has started turning
+    angle: float  # degrees, where it has started
+    end_angle: float  # degrees, where it stops
+    rate: float  # degrees per second, negative when the angle decreases
+
+
+def angles_at(times: np.ndarray, origin: SweepOrigin) -> np.ndarray:
+    """ the angles at `times` of a turn at a constant rate; before and after the turn, the motor is at its ends """
+    angles: np.ndarray = origin.angle + origin.rate * (np.asarray(times, dtype=np.float64) - origin.time)
+    return np.clip(angles, min(origin.angle, origin.end_angle), max(origin.angle, origin.end_angle))
+
+
+def bin_by_angle(angles: np.ndarray, width: float) -> Dict[float, np.ndarray]:
+    """ the indices of the angles by the centre of their bin; the bins are `width` wide, centred at its multiples """
+    if width <= 0.:
+        raise ValueError(f'Invalid bin width: {width}')
+    bin_indices: np.ndarray = np.round(np.asarray(angles) / width).astype(np.int64)
+    return {float(index * width): np.flatnonzero(bin_indices == index) for index in np.unique(bin_indices)}
+
+
+def sweep_records(samples: np.ndarray, origin: SweepOrigin, width: float) -> List[Dict[str, Any]]:
+    """
+    the samples of a sweep, with 'time' and 'voltage' fields like `ADCAcquisition.samples`, binned by angle
+    into records like those of a dwell, so that the τ calculators take the bins as they take the dwells
+    """
+    records: List[Dict[str, Any]] = []
+    angle: float
+    indices: np.ndarray
+    for angle, indices in bin_by_angle(angles_at(samples['time'], origin), width).items():
+        bin_samples: np.ndarray = samples[indices]
+        statistics: RunningStatistics = RunningStatistics(bin_samples['voltage'].shape[1])
+        voltages: np.ndarray
+        for voltages in bin_samples['voltage']:
+            statistics.add(voltages)
+        records.append({
+            'timestamp': float(np.mean(bin_samples['time'])),
+            'angle': angle,
+            'angle bin width': width,
+            'sample_times': bin_samples['time'].tolist(),
+            'voltage': np.round(bin_samples['voltage'].T.astype(np.float64), 7).tolist(),
+            'voltage statistics': statistics.as_dict(),
+        })
+    # in the order of visiting the angles
+    records.sort(key=lambda record: record['angle'], reverse=origin.rate < 0.)
+    return records
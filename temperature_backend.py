@@ -5,6 +5,8 @@ from typing import Dict, List, Optional, Union
 import serial
 import serial.tools.list_ports
 
+from serial_transaction import TransactionLock
+
 
 class Dallas18B20(Thread):
     D_MIN: int = 22
@@ -14,7 +16,7 @@ class Dallas18B20(Thread):
         super().__init__()
         self.daemon = True
         self._ser = serial.Serial()
-        self._communicating: bool = False
+        self.transactions: TransactionLock = TransactionLock(timeout=12.)
         self._temperatures: List[float] = []
         self._setpoints: List[int] = []
         self._states: List[bool] = []
@@ -25,7 +27,6 @@ class Dallas18B20(Thread):
         self._running: bool = False
 
     def _open_serial(self) -> None:
-        self._communicating = False
         ports = serial.tools.list_ports.comports()
         for port in ports:
             if (port.pid == 0x7523 and port.vid == 0x1a86) \
@@ -51,7 +52,6 @@ class Dallas18B20(Thread):
                     print('SerialException:', ex.strerror)
                 else:
                     print(f'{self._ser.port} opened for the Arduino Mega 2560 R3 (CDC ACM)')
-                    self._communicating = False
                     break
                 finally:
                     time.sleep(1)  # to be changed
@@ -61,28 +61,17 @@ class Dallas18B20(Thread):
         self._ser.cancel_write()
         self._ser.close()
 
-    def _block(self, timeout: float = 12.) -> bool:
-        i: int = 0
-        dt: float = 0.1
-        while self._communicating:
-            time.sleep(dt)
-            i += 1
-            if i * dt > timeout:
-                return False
-        return True
-
     def read_text(self, cmd: str, terminator: bytes = serial.serialutil.LF) -> str:
-        if not self._block():
+        if not self.transactions.acquire():
             print("Arduino is very busy to respond to", cmd)
             return ''
         # print('command:', cmd)
-        if not self._ser.is_open:
-            self._open_serial()
         resp: str = ''
         try:
+            if not self._ser.is_open:
+                self._open_serial()
             if self._ser.is_open:
                 msg: str = cmd + '\n'
-                self._communicating = True
                 self._ser.write(msg.encode())
                 # print('written', msg.encode('ascii'))
                 self._ser.flush()
@@ -94,36 +83,35 @@ class Dallas18B20(Thread):
                     print(f'UnicodeDecodeError while reading response {resp_bytes} to {cmd}')
                     resp = ''
                 self._ser.flush()
-                self._communicating = False
                 if not resp:
                     self._close_serial()
                     print('restarting', self._ser.port)
                 # print(cmd, resp.split(','))
                 return resp
         finally:
-            self._communicating = False
+            self.transactions.release()
             return resp
 
     def send(self, cmd: str) -> bool:
-        if not self._block():
+        if not self.transactions.acquire():
             print("Arduino is very busy to respond to", cmd)
             return False
         # print('sending', cmd)
-        if not self._ser.is_open:
-            self._open_serial()
-        while self._ser.is_open:
-            msg: str = cmd + '\n'
-            try:
-                self._communicating = True
-                self._ser.write(msg.encode())
-                # print('written', msg.encode('ascii'))
-                self._ser.flush()
-                self._communicating = False
-            except serial.SerialException:
-                self._communicating = False
-                continue
-            return True
-        return False
+        try:
+            if not self._ser.is_open:
+                self._open_serial()
+            while self._ser.is_open:
+                msg: str = cmd + '\n'
+                try:
+                    self._ser.write(msg.encode())
+                    # print('written', msg.encode('ascii'))
+                    self._ser.flush()
+                except serial.SerialException:
+                    continue
+                return True
+            return False
+        finally:
+            self.transactions.release()
 
     def voltage(self, pin: Union[int, str]) -> Optional[int]:
         mega_pins: Dict[str, int] = {